@@ -0,0 +1,21 @@
+// Japan Map Variant Loader (generated by process_geojson.py)
+(function () {
+    const VARIANTS = [{"src": "japan-map.compact.js", "maxDevicePx": 800}, {"src": "japan-map.js", "maxDevicePx": 1600}, {"src": "japan-map.hd.js", "maxDevicePx": null}];
+    const cssWidth = Math.min(window.innerWidth || document.documentElement.clientWidth, 1000);
+    const devicePx = cssWidth * Math.min(window.devicePixelRatio || 1, 2);
+    const pick = VARIANTS.find(v => v.maxDevicePx === null || devicePx <= v.maxDevicePx) || VARIANTS[VARIANTS.length - 1];
+    
+    // Resolve relative to this loader so it works from any page depth
+    const loader = document.currentScript;
+    const base = loader.src.replace(/[^/]*$/, '');
+    
+    function load(src, fallback) {
+        const script = document.createElement('script');
+        script.src = base + src;
+        script.async = false; // Keep execution order with other dynamically added scripts
+        // A variant that was not deployed falls back to the standard map
+        if (fallback && fallback !== src) script.onerror = () => load(fallback, null);
+        loader.after(script);
+    }
+    load(pick.src, "japan-map.js");
+})();
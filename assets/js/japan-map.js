@@ -1,7 +1,4 @@
 // Japan Map Dot Pattern Generator (GeoJSON Source - Multi-Res + Region Colors + Single Dot + Popup)
-document.addEventListener('DOMContentLoaded', () => {
-    initMap();
-});
 
 // Initialize modal handlers after a short delay to ensure DOM is ready
 setTimeout(() => {
@@ -892,3 +889,13 @@ function renderRegionalOverview() {
 
     mapSvg.appendChild(overviewGroup);
 }
+
+// Bootstrap last: initMap needs the let/const declarations above
+// Loaded dynamically by japan-map-loader.js, so the DOM may already be ready
+if (document.readyState === 'loading') {
+    document.addEventListener('DOMContentLoaded', () => {
+        initMap();
+    });
+} else {
+    initMap();
+}
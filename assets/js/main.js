@@ -274,3 +274,10 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
 });
+
+// Service worker (sw.js, generated by the build): repeat visits load the map and assets from cache
+if ('serviceWorker' in navigator) {
+    window.addEventListener('load', () => {
+        navigator.serviceWorker.register('/sw.js').catch(() => {});
+    });
+}
@@ -0,0 +1,63 @@
+import argparse
+import sys
+import tracemalloc
+
+from dot_store import DotStore
+
+# Memory of generated dots: one dict per dot (the generators' former layout)
+# vs the columnar DotStore. Dots are built the way generate_dots builds them,
+# with region/name/color strings shared across dots, and the peak traced
+# memory of each layout is reported.
+# Usage: python bench_dot_store.py [--dots 1000000]
+
+# Configuration
+DOTS = 1_000_000
+REGIONS = ['Hokkaido', 'Tohoku', 'Kanto', 'Chubu', 'Kansai', 'Chugoku', 'Shikoku', 'Kyushu', 'Okinawa']
+PREFECTURES = [f'pref-{i}' for i in range(1, 48)]
+COLORS = [f'c{i}' for i in range(8)]
+COLS = 400 # Dots per lattice row
+
+def dot_fields(i):
+    # Lattice position and labels of dot i, as generate_dots would produce them
+    pref = i * len(PREFECTURES) // DOTS
+    px = (i % COLS) * 2.0
+    py = (i // COLS) * 2.0
+    return (round(px, 1), round(py, 1), round(0.8, 2),
+            REGIONS[pref % len(REGIONS)], PREFECTURES[pref], COLORS[pref % len(COLORS)])
+
+def build_dicts(n):
+    dots = []
+    for i in range(n):
+        x, y, r, region, name, color = dot_fields(i)
+        dots.append({'x': x, 'y': y, 'r': r, 'region': region, 'name': name, 'color': color})
+    return dots
+
+def build_store(n):
+    dots = DotStore()
+    for i in range(n):
+        dots.append(*dot_fields(i))
+    return dots
+
+def peak_mb(build, n):
+    tracemalloc.start()
+    dots = build(n)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del dots
+    return peak / 1e6
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Peak memory of dict-per-dot vs DotStore.")
+    parser.add_argument('--dots', type=int, default=DOTS)
+    args = parser.parse_args(argv)
+
+    dicts = peak_mb(build_dicts, args.dots)
+    store = peak_mb(build_store, args.dots)
+    print(f"{args.dots:,} dots")
+    print(f"  dict per dot: {dicts:8.1f} MB")
+    print(f"  DotStore:     {store:8.1f} MB")
+    print(f"  ratio:        {dicts / store:8.1f}x")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
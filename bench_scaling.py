@@ -0,0 +1,375 @@
+import argparse
+import bisect
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import geometry_cache
+import process_geojson
+
+# Scaling benchmark for the GeoJSON dot generator on synthetic geometry.
+# Star and coastline-like polygons (MultiPolygons, with holes) are swept over
+# vertex count, polygon count and lattice spacing, one axis at a time. Each
+# generator engine is timed and memory-profiled, its dots are compared with
+# the reference engine, and a growth table gives the empirical exponent of
+# every metric between consecutive sizes (1.0 = linear, 2.0 = quadratic).
+# Usage: python bench_scaling.py [--quick] [--engines lattice,scanline] [--csv out.csv]
+
+# Configuration
+VERTEX_SWEEP = [10 ** 2, 10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6] # Total vertices over all features
+VERTEX_SWEEP_POLYGONS = 1 # One feature, so even 10^2 vertices fits PARTS_PER_FEATURE rings
+POLYGON_SWEEP = [1, 10, 100, 1000] # At BASE_VERTICES
+SPACING_SWEEP = [4.0, 2.0, 1.0, 0.5] # At BASE_VERTICES and BASE_POLYGONS
+BASE_VERTICES = 10 ** 4
+BASE_POLYGONS = 10
+BASE_SPACING = process_geojson.DOT_SPACING
+SHAPES = ['star', 'coastline']
+ENGINES = ['lattice', 'scanline', 'cached']
+REFERENCE_ENGINE = 'scanline' # Exact even-odd fill, linear in vertices; the others must match it
+MAX_SECONDS = 60.0 # An engine slower than this on one size is skipped for the larger ones
+PARTS_PER_FEATURE = 3 # MultiPolygon parts; every part has one hole
+HOLE_SCALE = 0.35 # Hole radius relative to its part
+VERTEX_FLOOR = 8 # Fewest vertices per ring
+SEED = 2024
+
+# Bounding box of the synthetic features (roughly Japan, so the projection behaves the same)
+LON_RANGE = (128.0, 146.0)
+LAT_RANGE = (30.0, 45.0)
+
+# Synthetic geometry (lon/lat rings, closed like GeoJSON)
+
+def star_ring(cx, cy, radius, n, rng):
+    # Alternating outer/inner radius: many thin spikes, a worst case for scanline crossings
+    pts = []
+    phase = rng.uniform(0, math.pi)
+    for k in range(n):
+        r = radius if k % 2 == 0 else radius * 0.45
+        a = phase + 2 * math.pi * k / n
+        pts.append([cx + r * math.cos(a), cy + r * math.sin(a) * 0.8])
+    pts.append(pts[0])
+    return pts
+
+def coastline_ring(cx, cy, radius, n, rng):
+    # Radius perturbed by a few octaves of random sinusoids: fractal-ish bays and capes
+    octaves = [(rng.randint(2 ** o, 2 ** (o + 1)), rng.uniform(0, 2 * math.pi), 0.5 ** o * 0.18)
+               for o in range(1, 8)]
+    pts = []
+    for k in range(n):
+        a = 2 * math.pi * k / n
+        r = radius * (1 + sum(amp * math.sin(freq * a + ph) for freq, ph, amp in octaves))
+        pts.append([cx + r * math.cos(a), cy + r * math.sin(a) * 0.8])
+    pts.append(pts[0])
+    return pts
+
+def make_features(shape, total_vertices, n_polygons, seed=SEED):
+    # n_polygons features on a jittered grid; each is a MultiPolygon of
+    # PARTS_PER_FEATURE parts (outer ring + one hole) sharing the vertex budget
+    rng = random.Random(seed)
+    make_ring = star_ring if shape == 'star' else coastline_ring
+    rings_per_feature = PARTS_PER_FEATURE * 2
+    per_ring = max(VERTEX_FLOOR, total_vertices // (n_polygons * rings_per_feature))
+
+    cols = math.ceil(math.sqrt(n_polygons))
+    rows = math.ceil(n_polygons / cols)
+    cell_w = (LON_RANGE[1] - LON_RANGE[0]) / cols
+    cell_h = (LAT_RANGE[1] - LAT_RANGE[0]) / rows
+    features = []
+    for i in range(n_polygons):
+        col, row = i % cols, i // cols
+        parts = []
+        for p in range(PARTS_PER_FEATURE):
+            radius = min(cell_w, cell_h) * 0.18
+            cx = LON_RANGE[0] + (col + 0.5) * cell_w + (p - 1) * radius * 1.5 + rng.uniform(-0.05, 0.05) * radius
+            cy = LAT_RANGE[0] + (row + 0.5) * cell_h + rng.uniform(-0.3, 0.3) * radius
+            outer = make_ring(cx, cy, radius, per_ring, rng)
+            hole = list(reversed(make_ring(cx, cy, radius * HOLE_SCALE, per_ring, rng)))
+            parts.append([outer, hole])
+        features.append({
+            'type': 'Feature',
+            'properties': {'id': i % 47 + 1, 'nam_ja': f'synthetic-{i}'},
+            'geometry': {'type': 'MultiPolygon', 'coordinates': parts}
+        })
+    return features
+
+def count_vertices(features):
+    return sum(len(ring) for f in features for part in f['geometry']['coordinates'] for ring in part)
+
+# Engines: each turns projected features into a DotStore
+
+def scanline_points(svg_ring, bbox, spacing):
+    # Same lattice and the same crossing test as point_in_polygon, evaluated per
+    # row: every edge adds its x-intersection to the rows it spans, so the cost
+    # is O(vertices + crossings + points) instead of O(points * vertices).
+    rmin_x, rmin_y, rmax_x, rmax_y = bbox
+    start_x = math.floor(rmin_x / spacing) * spacing
+    end_x = math.ceil(rmax_x / spacing) * spacing
+    start_y = math.floor(rmin_y / spacing) * spacing
+    end_y = math.ceil(rmax_y / spacing) * spacing
+
+    # Lattice coordinates built by the same repeated addition as lattice_points
+    xs = []
+    current_x = start_x
+    while current_x <= end_x:
+        xs.append(current_x)
+        current_x += spacing
+    ys = []
+    current_y = start_y
+    while current_y <= end_y:
+        ys.append(current_y)
+        current_y += spacing
+
+    crossings = [[] for _ in ys]
+    j = len(svg_ring) - 1
+    for i in range(len(svg_ring)):
+        xi, yi = svg_ring[i]
+        xj, yj = svg_ring[j]
+        j = i
+        if yi == yj:
+            continue
+        # Rows with (yi > y) != (yj > y), i.e. min <= y < max
+        lo, hi = (yj, yi) if yi > yj else (yi, yj)
+        for r in range(bisect.bisect_left(ys, lo), bisect.bisect_left(ys, hi)):
+            y = ys[r]
+            crossings[r].append((xj - xi) * (y - yi) / (yj - yi) + xi)
+
+    for y, row in zip(ys, crossings):
+        if not row:
+            continue
+        row.sort()
+        n = len(row)
+        for x in xs:
+            # Inside when an odd number of crossings lie strictly right of x
+            if (n - bisect.bisect_right(row, x)) % 2:
+                yield x, y
+
+def run_generate(projected, bounds, scale, offsets, spacing, points_fn=None):
+    # generate_dots with another point engine in place of lattice_points (None keeps it)
+    return process_geojson.generate_dots(projected, bounds, scale, offsets, spacing, points_fn=points_fn)
+
+def engine_lattice(ctx, spacing):
+    return run_generate(ctx['projected'], ctx['bounds'], ctx['scale'], ctx['offsets'], spacing)
+
+def engine_scanline(ctx, spacing):
+    return run_generate(ctx['projected'], ctx['bounds'], ctx['scale'], ctx['offsets'], spacing, scanline_points)
+
+def engine_cached(ctx, spacing):
+    # Pre-projected rings from a geometry_cache round trip (saved during setup), then scanline
+    meta, rings = geometry_cache.load(ctx['cache_base'], 'bench')
+    projected = [
+        {'id': f['id'], 'name': f['name'], 'rings': [rings[i] for i in f['rings']],
+         'bboxes': [tuple(b) for b in f['bboxes']]}
+        for f in meta['features']
+    ]
+    return run_generate(projected, ctx['bounds'], ctx['scale'], ctx['offsets'], spacing, scanline_points)
+
+ENGINE_FUNCS = {'lattice': engine_lattice, 'scanline': engine_scanline, 'cached': engine_cached}
+
+# Measurement
+
+def measure(fn, *args, memory=True):
+    # (result, seconds, peak MB); memory is profiled in a second run so
+    # tracemalloc overhead does not distort the timing
+    t0 = time.perf_counter()
+    result = fn(*args)
+    seconds = time.perf_counter() - t0
+    peak_mb = None
+    if memory:
+        tracemalloc.start()
+        fn(*args)
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    return result, seconds, peak_mb
+
+def same_dots(a, b):
+    if len(a) != len(b):
+        return False
+    return all(a.record(i) == b.record(i) for i in range(len(a)))
+
+def dots_in_holes(dots, features, bounds, scale, offsets):
+    # project_features keeps outer rings only; count dots that fall inside a hole
+    holes = []
+    for f in features:
+        for part in f['geometry']['coordinates']:
+            for ring in part[1:]:
+                svg = [process_geojson.geo_to_svg(p[0], p[1], bounds, scale, offsets) for p in ring]
+                holes.append((svg, process_geojson.ring_bbox(svg)))
+    count = 0
+    for i in range(len(dots)):
+        x, y = dots.x[i], dots.y[i]
+        for svg, (x0, y0, x1, y1) in holes:
+            if x0 <= x <= x1 and y0 <= y <= y1 and process_geojson.point_in_polygon(x, y, svg):
+                count += 1
+                break
+    return count
+
+def pip_us_per_call(features, bounds, scale, offsets, calls=200):
+    # Cost of one point_in_polygon call against the feature's largest outer ring
+    ring = max((part[0] for f in features for part in f['geometry']['coordinates']), key=len)
+    svg = [process_geojson.geo_to_svg(p[0], p[1], bounds, scale, offsets) for p in ring]
+    x0, y0, x1, y1 = process_geojson.ring_bbox(svg)
+    rng = random.Random(SEED)
+    pts = [(rng.uniform(x0, x1), rng.uniform(y0, y1)) for _ in range(calls)]
+    t0 = time.perf_counter()
+    for x, y in pts:
+        process_geojson.point_in_polygon(x, y, svg)
+    return (time.perf_counter() - t0) / calls * 1e6
+
+def run_case(shape, vertices, polygons, spacing, engines, skipped, tmpdir, memory=True):
+    features = make_features(shape, vertices, polygons)
+    row_base = {'shape': shape, 'vertices': count_vertices(features), 'polygons': polygons, 'spacing': spacing}
+
+    bounds, bounds_s, bounds_mb = measure(process_geojson.get_bounds, features, memory=memory)
+    scale, offsets = process_geojson.compute_transform(bounds)
+    projected, project_s, project_mb = measure(
+        process_geojson.project_features, features, bounds, scale, offsets, memory=memory)
+    cache_base = os.path.join(tmpdir, 'geometry')
+    all_rings = [ring for f in projected for ring in f['rings']]
+    meta_features, offset = [], 0
+    for f in projected:
+        meta_features.append({'id': f['id'], 'name': f['name'],
+                              'rings': list(range(offset, offset + len(f['rings']))), 'bboxes': f['bboxes']})
+        offset += len(f['rings'])
+    geometry_cache.save(cache_base, 'bench', {'features': meta_features}, all_rings)
+
+    ctx = {'projected': projected, 'bounds': bounds, 'scale': scale, 'offsets': offsets, 'cache_base': cache_base}
+    stage = dict(row_base, engine='(setup)', seconds=bounds_s + project_s,
+                 bounds_s=bounds_s, project_s=project_s,
+                 peak_mb=max(m for m in (bounds_mb, project_mb) if m is not None) if memory else None,
+                 pip_us=pip_us_per_call(features, bounds, scale, offsets),
+                 dots=None, match=None, in_holes=None)
+    rows = [stage]
+
+    reference = None
+    for engine in engines:
+        if engine in skipped:
+            rows.append(dict(row_base, engine=engine, seconds=None, peak_mb=None, dots=None,
+                             match=None, in_holes=None, note='skipped (over budget at a smaller size)'))
+            continue
+        dots, seconds, peak_mb = measure(ENGINE_FUNCS[engine], ctx, spacing, memory=memory)
+        if seconds > MAX_SECONDS:
+            skipped.add(engine)
+        row = dict(row_base, engine=engine, seconds=seconds, peak_mb=peak_mb, dots=len(dots))
+        if reference is None:
+            reference = dots # First engine run; the reference when it is selected
+        row['match'] = same_dots(dots, reference)
+        row['in_holes'] = dots_in_holes(dots, features, bounds, scale, offsets) if engine == REFERENCE_ENGINE else None
+        rows.append(row)
+    return rows
+
+# Reporting
+
+def fmt(value, digits=3):
+    if value is None:
+        return '-'
+    if isinstance(value, bool):
+        return 'yes' if value else 'NO'
+    if isinstance(value, float):
+        return f'{value:.{digits}f}'
+    return f'{value:,}' if isinstance(value, int) else str(value)
+
+def print_table(rows, columns):
+    widths = {c: max(len(c), *(len(fmt(r.get(c))) for r in rows)) for c in columns}
+    print('  '.join(f'{c:>{widths[c]}}' for c in columns))
+    for r in rows:
+        print('  '.join(f'{fmt(r.get(c)):>{widths[c]}}' for c in columns))
+
+def growth_rows(rows, axis, metrics):
+    # Empirical exponent d log(metric) / d log(axis) between consecutive sizes
+    out = []
+    series = {}
+    for r in rows:
+        series.setdefault((r['shape'], r['engine']), []).append(r)
+    for (shape, engine), items in series.items():
+        items = sorted(items, key=lambda r: r[axis])
+        for a, b in zip(items, items[1:]):
+            growth = {'shape': shape, 'engine': engine, 'from': a[axis], 'to': b[axis]}
+            for m in metrics:
+                va, vb = a.get(m), b.get(m)
+                if va and vb and a[axis] != b[axis]:
+                    growth[m] = math.log(vb / va) / math.log(b[axis] / a[axis])
+            out.append(growth)
+    return out
+
+def write_csv(path, rows, columns):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(','.join(columns) + '\n')
+        for r in rows:
+            f.write(','.join('' if r.get(c) is None else str(r.get(c)) for c in columns) + '\n')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scaling benchmark for the dot generator on synthetic polygons.")
+    parser.add_argument('--engines', default=','.join(ENGINES), help="comma-separated engines to run")
+    parser.add_argument('--shapes', default=','.join(SHAPES), help="comma-separated shapes (star, coastline)")
+    parser.add_argument('--sweeps', default='vertices,polygons,spacing', help="which axes to sweep")
+    parser.add_argument('--quick', action='store_true', help="sweep vertices only up to 10^4")
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc runs (halves run time)")
+    parser.add_argument('--csv', help="also write every measurement to this CSV file")
+    args = parser.parse_args(argv)
+
+    engines = args.engines.split(',')
+    unknown = [e for e in engines if e not in ENGINE_FUNCS]
+    if unknown:
+        parser.error(f"unknown engine(s): {', '.join(unknown)}")
+    # The reference runs first so every other engine is compared against it
+    engines.sort(key=lambda e: e != REFERENCE_ENGINE)
+    shapes = args.shapes.split(',')
+    sweeps = args.sweeps.split(',')
+    vertex_sweep = [v for v in VERTEX_SWEEP if not args.quick or v <= 10 ** 4]
+    memory = not args.no_memory
+
+    plans = []
+    if 'vertices' in sweeps:
+        plans.append(('vertices', [(v, VERTEX_SWEEP_POLYGONS, BASE_SPACING) for v in vertex_sweep]))
+    if 'polygons' in sweeps:
+        plans.append(('polygons', [(BASE_VERTICES, p, BASE_SPACING) for p in POLYGON_SWEEP]))
+    if 'spacing' in sweeps:
+        # Growth against 1/spacing, so exponents read like the other axes (2.0 = dots grow with area)
+        plans.append(('density', [(BASE_VERTICES, BASE_POLYGONS, s) for s in SPACING_SWEEP]))
+
+    columns = ['shape', 'vertices', 'polygons', 'spacing', 'engine', 'seconds', 'peak_mb',
+               'pip_us', 'dots', 'match', 'in_holes']
+    all_rows = []
+    mismatches = 0
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for axis, cases in plans:
+            for shape in shapes:
+                skipped = set()
+                sweep_rows = []
+                for vertices, polygons, spacing in cases:
+                    print(f"[{axis}] {shape}: {vertices:,} vertices, {polygons} polygons, spacing {spacing}",
+                          file=sys.stderr)
+                    for row in run_case(shape, vertices, polygons, spacing, engines, skipped, tmpdir, memory):
+                        row['sweep'] = axis
+                        row['density'] = 1 / row['spacing']
+                        sweep_rows.append(row)
+                        if row.get('match') is False:
+                            mismatches += 1
+                all_rows.extend(sweep_rows)
+
+    for axis, _ in plans:
+        rows = [r for r in all_rows if r['sweep'] == axis]
+        print(f"\n== Sweep: {axis} ==")
+        print_table(rows, columns)
+        if axis == 'density':
+            rows = [r for r in rows if r['engine'] != '(setup)'] # Bounds and projection do not depend on spacing
+        print(f"\nGrowth exponents vs {axis} (1.0 linear, 2.0 quadratic):")
+        print_table(growth_rows(rows, axis, ['seconds', 'peak_mb', 'pip_us', 'dots']),
+                    ['shape', 'engine', 'from', 'to', 'seconds', 'peak_mb', 'pip_us', 'dots'])
+
+    holes = sum(r['in_holes'] or 0 for r in all_rows)
+    if holes:
+        print(f"\nNote: {holes:,} reference dots fall inside polygon holes "
+              f"(project_features keeps outer rings only)")
+    if args.csv:
+        write_csv(args.csv, all_rows, ['sweep'] + columns)
+    if mismatches:
+        print(f"\n{mismatches} engine run(s) produced dots that differ from the {REFERENCE_ENGINE} engine")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+import argparse
+import fnmatch
+import glob
+import gzip
+import json
+import os
+import re
+import sys
+import time
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Performance budget check for the generated map assets.
+# Usage: python check_budget.py [--build] [--budget map-budget.json]
+# Exits 1 and prints a diff of the offending metrics when any budget is exceeded.
+
+BUDGET_FILE = 'map-budget.json'
+MAP_SCRIPTS = 'assets/js/japan-map*.js' # Main script plus any region chunks
+EVENTS_PAGE = 'events/index.html'
+
+def extract_payload(source):
+    # GeoJSON generator: currentMapData = {"overview": [...], "regions": {...}}
+    # BMP generator:     const japanDots = [...]
+    for pattern in (r'currentMapData = (?=[{\[])', r'japanDots = (?=\[)'):
+        m = re.search(pattern, source)
+        if m:
+            payload, _ = json.JSONDecoder().raw_decode(source, m.end())
+            if isinstance(payload, list):
+                return {'overview': payload, 'regions': {}}
+            return payload
+    return None
+
+def size_metrics(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    name = os.path.basename(path)
+    metrics = {
+        f'size.{name}.raw': len(data),
+        f'size.{name}.gzip': len(gzip.compress(data, compresslevel=9)),
+    }
+    if brotli is not None:
+        metrics[f'size.{name}.brotli'] = len(brotli.compress(data, quality=11))
+    return metrics
+
+def count_prerendered_nodes(page_path):
+    if not os.path.exists(page_path):
+        return None
+    with open(page_path, 'r', encoding='utf-8') as f:
+        page = f.read()
+    start = page.find('<!-- prerender:japan-map -->')
+    end = page.find('<!-- /prerender:japan-map -->')
+    if start == -1 or end == -1:
+        return None
+    # Opening tags only (elements, not comments or closing tags)
+    return len(re.findall(r'<[a-zA-Z]', page[start:end]))
+
+def collect_metrics(script_glob=MAP_SCRIPTS, page_path=EVENTS_PAGE):
+    metrics = {}
+    for path in sorted(glob.glob(script_glob)):
+        metrics.update(size_metrics(path))
+        with open(path, 'r', encoding='utf-8') as f:
+            payload = extract_payload(f.read())
+        if not payload:
+            continue
+
+        # Namespaced per script so responsive variants get their own budgets,
+        # e.g. dots.japan-map.overview vs dots.japan-map.hd.overview
+        stem = os.path.basename(path)[:-len('.js')]
+        overview = payload.get('overview', [])
+        regions = payload.get('regions', {})
+        metrics[f'dots.{stem}.overview'] = len(overview)
+        for region, dots in regions.items():
+            metrics[f'dots.{stem}.detail.{region}'] = len(dots)
+        if regions:
+            metrics[f'dots.{stem}.detail.total'] = sum(len(d) for d in regions.values())
+
+        # One <circle> per dot when rendered client-side
+        metrics[f'dom.{stem}.overview'] = len(overview)
+        for region, dots in regions.items():
+            metrics[f'dom.{stem}.region.{region}'] = len(dots)
+
+    prerendered = count_prerendered_nodes(page_path)
+    if prerendered is not None:
+        metrics['dom.overview.prerendered'] = prerendered
+    return metrics
+
+def load_budget(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def check(metrics, budget):
+    # Budget keys are fnmatch patterns so e.g. "dom.region.*" covers every region.
+    # An exact key wins over patterns, otherwise the longest matching pattern does.
+    failures = []
+    for key in sorted(metrics):
+        if key in budget:
+            limit = budget[key]
+        else:
+            patterns = [p for p in budget if fnmatch.fnmatchcase(key, p)]
+            if not patterns:
+                continue
+            limit = budget[max(patterns, key=len)]
+        if metrics[key] > limit:
+            failures.append((key, limit, metrics[key]))
+    return failures
+
+def fmt(value):
+    if isinstance(value, float):
+        return f'{value:.2f}'
+    return f'{value:,}'
+
+def report(metrics, failures):
+    failed = {key for key, _, _ in failures}
+    width = max((len(k) for k in metrics), default=10)
+    print(f"{'metric':<{width}}  {'value':>12}")
+    for key in sorted(metrics):
+        flag = '  OVER' if key in failed else ''
+        print(f"{key:<{width}}  {fmt(metrics[key]):>12}{flag}")
+    if brotli is None:
+        print("(brotli not installed: brotli sizes not measured)")
+
+    if failures:
+        print()
+        print(f"Budget exceeded for {len(failures)} metric(s):")
+        for key, limit, value in failures:
+            over = value - limit
+            pct = over / limit * 100 if limit else float('inf')
+            print(f"- {key}: {fmt(limit)}")
+            print(f"+ {key}: {fmt(value)}  (+{fmt(over)}, +{pct:.1f}%)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check generated map assets against the performance budget.")
+    parser.add_argument('--budget', default=BUDGET_FILE, help="budget JSON file (metric pattern -> max value)")
+    parser.add_argument('--scripts', default=MAP_SCRIPTS, help="glob of generated map scripts to inspect")
+    parser.add_argument('--page', default=EVENTS_PAGE, help="page holding the prerendered overview")
+    parser.add_argument('--build', action='store_true', help="run process_geojson.py first and budget its run time")
+    args = parser.parse_args(argv)
+
+    metrics = {}
+    if args.build:
+        import process_geojson
+        t0 = time.perf_counter()
+        process_geojson.main()
+        metrics['time.generate'] = time.perf_counter() - t0
+
+    metrics.update(collect_metrics(args.scripts, args.page))
+    failures = check(metrics, load_budget(args.budget))
+    report(metrics, failures)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
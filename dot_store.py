@@ -0,0 +1,142 @@
+import json
+from array import array
+
+# Columnar dot storage shared by process_geojson.py and process_map.py.
+# One float32/uint16 slot per dot and column instead of one dict per dot;
+# region, name and color strings are interned into small lookup tables.
+
+FIELDS = ('x', 'y', 'r', 'region', 'name', 'color')
+
+
+class DotStore:
+    def __init__(self, coord_digits=1, radius_digits=2):
+        # Digits used when turning float32 columns back into numbers (0 -> int)
+        self.coord_digits = coord_digits
+        self.radius_digits = radius_digits
+
+        self.x = array('f')
+        self.y = array('f')
+        self.r = array('f')
+        self.region = array('H')
+        self.name = array('H')
+        self.color = array('H')
+
+        self.regions = []
+        self.names = []
+        self.colors = []
+        self._lookup = {'region': {}, 'name': {}, 'color': {}}
+
+    def __len__(self):
+        return len(self.x)
+
+    def _intern(self, kind, table, value):
+        lookup = self._lookup[kind]
+        idx = lookup.get(value)
+        if idx is None:
+            idx = len(table)
+            lookup[value] = idx
+            table.append(value)
+        return idx
+
+    def append(self, x, y, r=0.0, region='', name='', color=''):
+        self.x.append(x)
+        self.y.append(y)
+        self.r.append(r)
+        self.region.append(self._intern('region', self.regions, region))
+        self.name.append(self._intern('name', self.names, name))
+        self.color.append(self._intern('color', self.colors, color))
+
+    def _num(self, value, digits):
+        if digits == 0:
+            return int(round(value))
+        return round(value, digits)
+
+    # Per-dot accessors (no dict allocation)
+    def x_of(self, i):
+        return self._num(self.x[i], self.coord_digits)
+
+    def y_of(self, i):
+        return self._num(self.y[i], self.coord_digits)
+
+    def r_of(self, i):
+        return self._num(self.r[i], self.radius_digits)
+
+    def region_of(self, i):
+        return self.regions[self.region[i]]
+
+    def name_of(self, i):
+        return self.names[self.name[i]]
+
+    def color_of(self, i):
+        return self.colors[self.color[i]]
+
+    def record(self, i, fields=FIELDS):
+        getters = {
+            'x': self.x_of, 'y': self.y_of, 'r': self.r_of,
+            'region': self.region_of, 'name': self.name_of, 'color': self.color_of
+        }
+        return {f: getters[f](i) for f in fields}
+
+    def set_labels(self, kind, values):
+        # Replaces a whole string column ('region', 'name' or 'color'), one value per dot
+        table = {'region': self.regions, 'name': self.names, 'color': self.colors}[kind]
+        table.clear()
+        self._lookup[kind].clear()
+        setattr(self, kind, array('H', (self._intern(kind, table, v) for v in values)))
+
+    # Filtering and grouping
+    def select(self, indices):
+        # New store with the given dots, in the given order; string tables are shared
+        # as copies, so no value is re-interned
+        if not isinstance(indices, array):
+            indices = array('I', indices)
+        sub = DotStore(self.coord_digits, self.radius_digits)
+        for kind in ('x', 'y', 'r', 'region', 'name', 'color'):
+            column = getattr(self, kind)
+            setattr(sub, kind, array(column.typecode, [column[i] for i in indices]))
+        sub.regions = list(self.regions)
+        sub.names = list(self.names)
+        sub.colors = list(self.colors)
+        sub._lookup = {kind: dict(lookup) for kind, lookup in self._lookup.items()}
+        return sub
+
+    def filter(self, predicate):
+        # predicate(i) -> bool, given dot indices so it can use any accessor
+        return self.select(i for i in range(len(self)) if predicate(i))
+
+    def indices_by_region(self):
+        # {region: array of dot indices}, regions in first-appearance order
+        groups = {}
+        for i, region_id in enumerate(self.region):
+            group = groups.get(region_id)
+            if group is None:
+                group = groups[region_id] = array('I')
+            group.append(i)
+        return {self.regions[region_id]: idxs for region_id, idxs in groups.items()}
+
+    def group_by_region(self):
+        # {region: DotStore of its dots}, in first-appearance order
+        return {region: self.select(idxs) for region, idxs in self.indices_by_region().items()}
+
+    # Combining
+    def extend(self, other):
+        # Append another store's dots, re-interning its string tables into ours
+        region_ids = [self._intern('region', self.regions, v) for v in other.regions]
+        name_ids = [self._intern('name', self.names, v) for v in other.names]
+        color_ids = [self._intern('color', self.colors, v) for v in other.colors]
+        self.x.extend(other.x)
+        self.y.extend(other.y)
+        self.r.extend(other.r)
+        self.region.extend(region_ids[i] for i in other.region)
+        self.name.extend(name_ids[i] for i in other.name)
+        self.color.extend(color_ids[i] for i in other.color)
+
+    # Serialization
+    def iter_json(self, fields=FIELDS):
+        # Yields the JSON array piece by piece; join or write the pieces as needed
+        yield '['
+        for i in range(len(self)):
+            if i:
+                yield ', '
+            yield json.dumps(self.record(i, fields), ensure_ascii=False)
+        yield ']'
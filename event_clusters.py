@@ -0,0 +1,93 @@
+import math
+
+# Build-time hierarchical clustering of event points for the map (supercluster
+# style, grid based). Every event starts as a leaf at zoom max_zoom + 1; going
+# up one zoom at a time, clusters whose centers share a grid cell of
+# radius / 2**zoom SVG units (within the same region) merge into one cluster at
+# their count-weighted centroid.
+# Leaves are numbered depth-first, so every cluster covers a contiguous range
+# of the leaf order and ships as five numbers: x, y, start, count, region.
+
+FIELDS_PER_CLUSTER = 5
+
+def events_fingerprint(all_events):
+    # 32-bit FNV-1a over "name|lat|lon" lines, mirrored by eventsFingerprint in the
+    # map script, so a tree built for other event data is never applied. Fields are
+    # formatted like JS template strings, a missing one included ("undefined")
+    h = 0x811C9DC5
+    for e in all_events:
+        line = f"{_js_num(e.get('name'))}|{_js_num(e.get('lat'))}|{_js_num(e.get('lon'))}\n"
+        units = line.encode('utf-16-le') # JS hashes UTF-16 code units
+        for i in range(0, len(units), 2):
+            h ^= units[i] | (units[i + 1] << 8)
+            h = (h * 0x01000193) & 0xFFFFFFFF
+    return h
+
+def _js_num(v):
+    # String(v) in JS: integral floats print without ".0", missing values as "undefined"
+    if v is None:
+        return 'undefined'
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v)
+
+def _merge(members):
+    count = sum(m['count'] for m in members)
+    return {
+        'x': sum(m['x'] * m['count'] for m in members) / count,
+        'y': sum(m['y'] * m['count'] for m in members) / count,
+        'region': members[0]['region'],
+        'count': count,
+        'children': members,
+    }
+
+def build_cluster_tree(points, max_zoom, radius, digits=1):
+    # points: (x, y, region, event_index) in SVG space
+    regions = sorted({p[2] for p in points})
+    leaves = [
+        {'x': x, 'y': y, 'region': region, 'count': 1, 'children': [], 'event': idx}
+        for x, y, region, idx in sorted(points, key=lambda p: (p[2], p[1], p[0], p[3]))
+    ]
+
+    levels = [None] * (max_zoom + 2)
+    levels[max_zoom + 1] = leaves
+    current = leaves
+    for zoom in range(max_zoom, -1, -1):
+        cell = radius / (2 ** zoom)
+        cells = {}
+        for node in current:
+            key = (node['region'], math.floor(node['x'] / cell), math.floor(node['y'] / cell))
+            cells.setdefault(key, []).append(node)
+        current = [_merge(members) for members in cells.values()]
+        levels[zoom] = current
+
+    # Depth-first numbering from the top level down gives each cluster its leaf range
+    order = []
+    stack = list(reversed(levels[0]))
+    while stack:
+        node = stack.pop()
+        node['start'] = len(order)
+        if 'event' in node:
+            order.append(node['event'])
+        else:
+            stack.extend(reversed(node['children']))
+
+    region_ids = {r: i for i, r in enumerate(regions)}
+    packed_levels = []
+    for nodes in levels:
+        flat = []
+        for node in sorted(nodes, key=lambda n: n['start']):
+            flat.extend((
+                round(node['x'], digits), round(node['y'], digits),
+                node['start'], node['count'], region_ids[node['region']],
+            ))
+        packed_levels.append(flat)
+
+    return {'maxZoom': max_zoom, 'regions': regions, 'order': order, 'levels': packed_levels}
+
+def iter_level(tree, zoom):
+    # Yields (x, y, region, event indices) for every cluster of one level
+    level = tree['levels'][zoom]
+    for i in range(0, len(level), FIELDS_PER_CLUSTER):
+        x, y, start, count, region = level[i:i + FIELDS_PER_CLUSTER]
+        yield x, y, tree['regions'][region], tree['order'][start:start + count]
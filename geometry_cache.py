@@ -0,0 +1,79 @@
+import hashlib
+import json
+import mmap
+import os
+import sys
+import tempfile
+from array import array
+
+from map_writer import atomic_open
+
+# Persistent cache of pre-projected geometry for process_geojson.py.
+# <base>.bin holds every ring as flat little-endian float64 x,y pairs;
+# <base>.json is the index: cache key, ring offsets/counts and the caller's
+# metadata (bounds, transform, per-feature properties and bboxes).
+# The key covers the source file's hash and the projection parameters, so
+# editing either invalidates the cache.
+
+CACHE_VERSION = 1
+
+def cache_key(source_path, params):
+    digest = hashlib.sha256()
+    with open(source_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    digest.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+    digest.update(str(CACHE_VERSION).encode('ascii'))
+    return digest.hexdigest()
+
+def save(cache_base, key, meta, rings):
+    # rings: sequences of (x, y) tuples; their position is the ring index used in meta
+    os.makedirs(os.path.dirname(os.path.abspath(cache_base)), exist_ok=True)
+    coords = array('d')
+    ring_index = []
+    for ring in rings:
+        ring_index.append([len(coords) // 2, len(ring)])
+        for x, y in ring:
+            coords.append(x)
+            coords.append(y)
+    if sys.byteorder != 'little':
+        coords.byteswap()
+
+    bin_path = cache_base + '.bin'
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(bin_path)), suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        coords.tofile(f)
+    os.replace(tmp_path, bin_path)
+
+    # The index is written last: a valid index always points at a complete .bin
+    with atomic_open(cache_base + '.json') as f:
+        json.dump({'version': CACHE_VERSION, 'key': key, 'rings': ring_index, 'meta': meta}, f)
+
+def load(cache_base, key):
+    # Returns (meta, rings) or None when the cache is missing or stale
+    index_path = cache_base + '.json'
+    bin_path = cache_base + '.bin'
+    if not (os.path.exists(index_path) and os.path.exists(bin_path)):
+        return None
+    with open(index_path, 'r', encoding='utf-8') as f:
+        index = json.load(f)
+    if index.get('version') != CACHE_VERSION or index.get('key') != key:
+        return None
+
+    rings = []
+    with open(bin_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return index['meta'], [[] for _ in index['rings']]
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if sys.byteorder == 'little':
+                view = memoryview(mm).cast('d')
+            else:
+                view = array('d', mm)
+                view.byteswap()
+            for offset, count in index['rings']:
+                start = offset * 2
+                end = start + count * 2
+                rings.append(list(zip(view[start:end:2], view[start + 1:end:2])))
+            if isinstance(view, memoryview):
+                view.release()
+    return index['meta'], rings
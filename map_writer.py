@@ -0,0 +1,46 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+# Streaming, atomic output for the generated map scripts.
+# Chunks are written to a temp file next to the target and renamed into place
+# only after everything was written, so a crash never leaves a truncated
+# japan-map.js behind for the web server to serve.
+
+
+@contextmanager
+def atomic_open(path, encoding='utf-8'):
+    target_dir = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(
+        prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=target_dir
+    )
+    try:
+        with os.fdopen(fd, 'w', encoding=encoding, newline='') as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates 0600; keep the existing mode or fall back to world-readable
+        mode = os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o644
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def write_chunks(f, chunks):
+    # Returns the number of characters written
+    total = 0
+    for chunk in chunks:
+        f.write(chunk)
+        total += len(chunk)
+    return total
+
+
+def split_template(template, placeholder):
+    # Templates carry a single placeholder where the streamed payload goes
+    head, sep, tail = template.partition(placeholder)
+    if not sep:
+        raise ValueError(f"Placeholder {placeholder!r} not found in template")
+    return head, tail
@@ -0,0 +1,178 @@
+import struct
+import zlib
+
+# Streaming, stdlib-only PNG reader for process_map.py.
+# IDAT data is inflated incrementally with zlib.decompressobj and rows are
+# unfiltered as they arrive, so only the previous and current scanline are
+# held in memory; callers get RGB pixels for the rows they ask for only.
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# Samples per pixel by color type
+CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+def is_png(filepath):
+    with open(filepath, 'rb') as f:
+        return f.read(8) == PNG_SIGNATURE
+
+def _chunks(f):
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            raise ValueError("Truncated PNG: missing IEND")
+        length, ctype = struct.unpack('>I4s', header)
+        data = f.read(length)
+        crc = f.read(4)
+        if len(data) < length or len(crc) < 4:
+            raise ValueError("Truncated PNG chunk")
+        if zlib.crc32(ctype + data) != struct.unpack('>I', crc)[0]:
+            raise ValueError(f"Corrupt PNG chunk {ctype!r}")
+        yield ctype, data
+        if ctype == b'IEND':
+            return
+
+def read_png_header(filepath):
+    with open(filepath, 'rb') as f:
+        if f.read(8) != PNG_SIGNATURE:
+            raise ValueError("Not a valid PNG file")
+        ctype, data = next(_chunks(f))
+    if ctype != b'IHDR':
+        raise ValueError("PNG does not start with IHDR")
+    width, height, bit_depth, color_type, _, _, interlace = struct.unpack('>IIBBBBB', data)
+    if color_type not in CHANNELS:
+        raise ValueError(f"Unsupported PNG color type: {color_type}")
+    if interlace:
+        raise ValueError("Interlaced (Adam7) PNG not supported")
+    if bit_depth not in (1, 2, 4, 8, 16) or (bit_depth < 8 and color_type not in (0, 3)):
+        raise ValueError(f"Unsupported PNG bit depth {bit_depth} for color type {color_type}")
+    return width, height, bit_depth, color_type
+
+def _unfilter(filter_type, row, prev, bpp):
+    # row is modified in place; prev is the previous reconstructed row (zeros for the first)
+    n = len(row)
+    if filter_type == 0:
+        pass
+    elif filter_type == 1: # Sub
+        for i in range(bpp, n):
+            row[i] = (row[i] + row[i - bpp]) & 0xFF
+    elif filter_type == 2: # Up
+        for i in range(n):
+            row[i] = (row[i] + prev[i]) & 0xFF
+    elif filter_type == 3: # Average
+        for i in range(n):
+            left = row[i - bpp] if i >= bpp else 0
+            row[i] = (row[i] + ((left + prev[i]) >> 1)) & 0xFF
+    elif filter_type == 4: # Paeth
+        for i in range(n):
+            a = row[i - bpp] if i >= bpp else 0
+            b = prev[i]
+            c = prev[i - bpp] if i >= bpp else 0
+            p = a + b - c
+            pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+            if pa <= pb and pa <= pc:
+                pred = a
+            elif pb <= pc:
+                pred = b
+            else:
+                pred = c
+            row[i] = (row[i] + pred) & 0xFF
+    else:
+        raise ValueError(f"Invalid PNG filter type: {filter_type}")
+
+def _samples(row, bit_depth, count):
+    # Unpack `count` samples of bit_depth from a reconstructed row, scaled to 0-255
+    if bit_depth == 8:
+        return row[:count]
+    if bit_depth == 16:
+        return row[0:count * 2:2] # High byte
+    per_byte = 8 // bit_depth
+    mask = (1 << bit_depth) - 1
+    out = bytearray(count)
+    for i in range(count):
+        byte = row[i // per_byte]
+        shift = 8 - bit_depth * (i % per_byte + 1)
+        out[i] = (byte >> shift) & mask
+    return out
+
+def _to_rgb(row, width, bit_depth, color_type, palette):
+    channels = CHANNELS[color_type]
+    s = _samples(row, bit_depth, width * channels)
+    if color_type == 3:
+        return [palette[i] for i in s]
+    if color_type == 0:
+        if bit_depth < 8:
+            scale = 255 // ((1 << bit_depth) - 1)
+            return [(v * scale,) * 3 for v in s]
+        return [(v, v, v) for v in s]
+
+    if color_type == 4:
+        pixels = [(s[i], s[i], s[i], s[i + 1]) for i in range(0, len(s), 2)]
+    elif color_type == 2:
+        return [(s[i], s[i + 1], s[i + 2]) for i in range(0, len(s), 3)]
+    else:
+        pixels = [(s[i], s[i + 1], s[i + 2], s[i + 3]) for i in range(0, len(s), 4)]
+    # Composite alpha over white, which the classifier treats as background
+    return [
+        (r, g, b) if a == 255 else (
+            (r * a + 255 * (255 - a)) // 255,
+            (g * a + 255 * (255 - a)) // 255,
+            (b * a + 255 * (255 - a)) // 255,
+        )
+        for r, g, b, a in pixels
+    ]
+
+def iter_png_rows(filepath, rows=None):
+    # Yields (y, [(r, g, b), ...]) top to bottom for each y in `rows` (all rows if None).
+    # Every scanline is still unfiltered (filters depend on the row above),
+    # but only the requested ones are converted to pixels.
+    width, height, bit_depth, color_type = read_png_header(filepath)
+    bits_per_pixel = CHANNELS[color_type] * bit_depth
+    bpp = max(1, bits_per_pixel // 8) # Filter unit in bytes
+    stride = (width * bits_per_pixel + 7) // 8
+    wanted = set(range(height)) if rows is None else set(rows)
+    last_wanted = max(wanted) if wanted else -1
+
+    palette = None
+    inflater = zlib.decompressobj()
+    pending = bytearray()
+    prev = bytearray(stride)
+    y = 0
+
+    with open(filepath, 'rb') as f:
+        f.read(8)
+        for ctype, data in _chunks(f):
+            if ctype == b'PLTE':
+                palette = [tuple(data[i:i + 3]) for i in range(0, len(data) - 2, 3)]
+            elif ctype == b'tRNS' and color_type == 3 and palette:
+                # Palette alpha: composite transparent entries over white
+                alphas = list(data) + [255] * (len(palette) - len(data))
+                palette = [
+                    rgb if a == 255 else tuple((c * a + 255 * (255 - a)) // 255 for c in rgb)
+                    for rgb, a in zip(palette, alphas)
+                ]
+            elif ctype == b'IDAT':
+                if color_type == 3 and palette is None:
+                    raise ValueError("Palette PNG without PLTE chunk")
+                while True:
+                    # Inflate at most one filtered scanline per step
+                    out = inflater.decompress(data, stride + 1)
+                    data = inflater.unconsumed_tail
+                    pending += out
+                    while len(pending) > stride and y < height:
+                        filter_type = pending[0]
+                        row = pending[1:stride + 1]
+                        del pending[:stride + 1]
+                        _unfilter(filter_type, row, prev, bpp)
+                        if y in wanted:
+                            yield y, _to_rgb(row, width, bit_depth, color_type, palette)
+                        prev = row
+                        y += 1
+                        if y > last_wanted:
+                            return
+                    # A full-sized output may mean more is buffered inside the inflater
+                    if not data and len(out) < stride + 1:
+                        break
+            elif ctype == b'IEND':
+                break
+
+    raise ValueError(f"Truncated PNG image data: got {y} of {height} rows")
@@ -0,0 +1,233 @@
+import argparse
+import email.utils
+import gzip
+import os
+import re
+import sys
+import time
+from functools import partial
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Local preview server with production-like delivery, for performance testing.
+# Serves precompressed .br/.gz siblings by Accept-Encoding, answers
+# If-None-Match with 304, sends Cache-Control (immutable for hashed file
+# names) and logs bytes and latency per request.
+# Usage: python preview_server.py [--port 8000] [--precompress]
+
+# Configuration
+PORT = 8000
+BIND = '127.0.0.1'
+ERROR_PAGE = '404.html' # Same as ErrorDocument in .htaccess
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')] # Preferred first
+COMPRESSIBLE = ('.html', '.css', '.js', '.json', '.svg', '.geojson', '.txt')
+MIN_COMPRESS_BYTES = 1024
+
+# Cache-Control by file name; the first matching pattern wins
+HASHED_NAME = re.compile(r'\.[0-9a-f]{8,}(-\d+)?\.\w+$') # style.min.<sha>.css, biitsz.<hash>-320.webp
+CACHE_RULES = [
+    (re.compile(r'(^|/)sw\.js$'), 'no-cache'), # .htaccess: workers revalidate every load
+    (HASHED_NAME, 'public, max-age=31536000, immutable'),
+]
+DEFAULT_CACHE_CONTROL = 'public, max-age=600' # GitHub Pages default
+
+def cache_control(path):
+    name = path.replace(os.sep, '/')
+    for pattern, value in CACHE_RULES:
+        if pattern.search(name):
+            return value
+    return DEFAULT_CACHE_CONTROL
+
+def make_etag(st, encoding):
+    # Size + mtime like most static servers; the encoding keeps variants distinct
+    tag = f'{st.st_size:x}-{st.st_mtime_ns:x}'
+    if encoding:
+        tag += '-' + encoding
+    return f'"{tag}"'
+
+def accepted_encodings(header):
+    # Accept-Encoding tokens with a non-zero q value
+    accepted = set()
+    for part in (header or '').split(','):
+        token, _, params = part.strip().partition(';')
+        q = params.strip()
+        if q.startswith('q='):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        if token:
+            accepted.add(token.strip().lower())
+    return accepted
+
+def precompress(root):
+    # Writes .gz (and .br when brotli is installed) next to every compressible file
+    written = 0
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith('.') and d != '__pycache__']
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if not name.endswith(COMPRESSIBLE) or os.path.getsize(path) < MIN_COMPRESS_BYTES:
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            siblings = [('.gz', lambda d: gzip.compress(d, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                siblings.append(('.br', lambda d: brotli.compress(d, quality=11)))
+            for suffix, compress in siblings:
+                target = path + suffix
+                if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+                    continue
+                with open(target, 'wb') as f:
+                    f.write(compress(data))
+                written += 1
+    if brotli is None:
+        print("(brotli not installed: only .gz siblings written)")
+    return written
+
+class PreviewHandler(SimpleHTTPRequestHandler):
+    # Keep-alive like production; every response below carries Content-Length (304s have no body)
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self._start = time.perf_counter()
+        self._sent = 0
+        self._encoding = None
+        super().do_GET()
+
+    def do_HEAD(self):
+        self._start = time.perf_counter()
+        self._sent = 0
+        self._encoding = None
+        super().do_HEAD()
+
+    def copyfile(self, source, outputfile):
+        # Count body bytes as they go out, for the request log
+        while True:
+            block = source.read(64 * 1024)
+            if not block:
+                break
+            outputfile.write(block)
+            self._sent += len(block)
+
+    def pick_variant(self, path):
+        # Returns (file to send, Content-Encoding) honoring Accept-Encoding
+        if not path.endswith(COMPRESSIBLE):
+            return path, None
+        accepted = accepted_encodings(self.headers.get('Accept-Encoding'))
+        for encoding, suffix in ENCODINGS:
+            sibling = path + suffix
+            if encoding in accepted and os.path.isfile(sibling):
+                if os.path.getmtime(sibling) < os.path.getmtime(path):
+                    self.log_message("stale %s ignored (older than %s)", sibling, path)
+                    continue
+                return sibling, encoding
+        return path, None
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            index = os.path.join(path, 'index.html')
+            if not self.path.split('?', 1)[0].endswith('/') or not os.path.isfile(index):
+                return super().send_head() # Trailing-slash redirect or directory listing
+            path = index
+        if not os.path.isfile(path):
+            return self.send_error_page()
+
+        send_path, encoding = self.pick_variant(path)
+        st = os.stat(send_path)
+        etag = make_etag(st, encoding)
+        self._encoding = encoding
+
+        tags = [t.strip() for t in self.headers.get('If-None-Match', '').split(',')]
+        if etag in tags or '*' in tags: # "*" matches any existing file
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_common_headers(path, etag, encoding)
+            self.end_headers()
+            return None
+
+        f = open(send_path, 'rb')
+        try:
+            self.send_response(HTTPStatus.OK)
+            self.send_header('Content-Type', self.guess_type(path))
+            self.send_header('Content-Length', str(st.st_size))
+            self.send_header('Last-Modified', email.utils.formatdate(st.st_mtime, usegmt=True))
+            self.send_common_headers(path, etag, encoding)
+            self.end_headers()
+            return f
+        except BaseException:
+            f.close()
+            raise
+
+    def send_common_headers(self, path, etag, encoding):
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', cache_control(os.path.relpath(path, self.directory)))
+        if path.endswith(COMPRESSIBLE):
+            self.send_header('Vary', 'Accept-Encoding')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+
+    def send_error_page(self):
+        error_page = os.path.join(self.directory, ERROR_PAGE)
+        if not os.path.isfile(error_page):
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+        f = open(error_page, 'rb')
+        self.send_response(HTTPStatus.NOT_FOUND)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(os.fstat(f.fileno()).st_size))
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        return f
+
+    def log_request(self, code='-', size='-'):
+        # Replaced by the per-request line in log_timing
+        pass
+
+    def handle_one_request(self):
+        self._start = None
+        super().handle_one_request()
+        if self._start is not None:
+            self.log_timing()
+
+    def log_timing(self):
+        elapsed = (time.perf_counter() - self._start) * 1000
+        status = getattr(self, '_status', '-')
+        encoding = self._encoding or 'identity'
+        sys.stderr.write(
+            f"{self.command} {self.path} {status} {encoding} {self._sent:,} B {elapsed:.1f} ms\n"
+        )
+
+    def send_response(self, code, message=None):
+        self._status = int(code)
+        super().send_response(code, message)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Preview the site with precompressed assets and production cache headers.")
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--bind', default=BIND)
+    parser.add_argument('--directory', default='.', help="site root to serve (default: current directory)")
+    parser.add_argument('--precompress', action='store_true', help="write missing or stale .gz/.br siblings before serving")
+    args = parser.parse_args(argv)
+
+    root = os.path.abspath(args.directory)
+    if args.precompress:
+        print(f"Precompressed {precompress(root)} file(s)")
+
+    handler = partial(PreviewHandler, directory=root)
+    with ThreadingHTTPServer((args.bind, args.port), handler) as httpd:
+        print(f"Serving {root} at http://{args.bind}:{args.port}/ (Ctrl+C to stop)")
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            print("\nStopped")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
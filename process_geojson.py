@@ -1,14 +1,52 @@
+import hashlib
+import html
 import json
 import math
 import os
 
+import event_clusters
+import geometry_cache
+import service_worker
+from dot_store import DotStore
+from map_writer import atomic_open, split_template, write_chunks
+
 # Configuration
 INPUT_FILE = 'assets/data/japan.geojson'
 OUTPUT_FILE = 'assets/js/japan-map.js'
+GEOMETRY_CACHE = '.cache/japan-geometry' # Pre-projected rings (.bin) + index (.json)
+LOADER_FILE = 'assets/js/japan-map-loader.js'
 DOT_SPACING = 2.0 # Finer dots for Overview to capture Aomori
 DETAIL_SPACING = 1.5 # Even finer for Zoom
 SVG_WIDTH = 800 
 SVG_HEIGHT = 900 # Reduced from 1050 to trim bottom whitespace
+MAP_FIT = 0.9 # Share of the SVG canvas the map fills (part of the geometry cache key)
+
+# Responsive variants, generated in one run and picked client-side by the loader.
+# max_device_px: largest map width in device pixels (CSS px * devicePixelRatio) the variant serves.
+DEFAULT_VARIANT = 'standard' # Written to OUTPUT_FILE and prerendered into the events page
+MAP_VARIANTS = [
+    {'name': 'compact', 'dot_spacing': 3.0, 'detail_spacing': 2.0, 'max_device_px': 800},
+    {'name': 'standard', 'dot_spacing': DOT_SPACING, 'detail_spacing': DETAIL_SPACING, 'max_device_px': 1600},
+    {'name': 'hd', 'dot_spacing': 1.5, 'detail_spacing': 1.0, 'max_device_px': None},
+]
+MAP_MAX_CSS_WIDTH = 1000 # .map-container max-width in events.css
+
+# Adaptive density: per-prefecture spacing instead of one global lattice
+ADAPTIVE_DENSITY = False
+MIN_DOTS_PER_PREFECTURE = 12 # Coverage guarantee per prefecture (plus one dot per otherwise empty island)
+ADAPTIVE_SPACING_FACTORS = (2.0, 1.5, 1.0, 0.75) # Tried coarse to fine, relative to the resolution's spacing
+
+# Build-time prerender of the overview into the events page
+EVENTS_FILE = 'assets/data/events-data.js'
+EVENTS_PAGE = 'events/index.html'
+PRERENDER_START = '<!-- prerender:japan-map -->'
+PRERENDER_END = '<!-- /prerender:japan-map -->'
+MAP_DATA_PLACEHOLDER = '/*@@MAP_DATA@@*/' # Where the streamed dot payload goes in the template
+EVENT_MAX_DIST_SQ = 0.05 # Must match MAX_DIST_SQ in mapEventsToDots
+
+# Event clustering: grid cell of CLUSTER_RADIUS SVG units at the overview zoom, halved per zoom level
+CLUSTER_RADIUS = 40
+CLUSTER_MAX_ZOOM = 5 # Deeper than any region view; beyond it every event is its own leaf
 
 # Region Mapping (Same as before)
 REGION_MAP = {
@@ -45,6 +83,71 @@ def mercator_projection(lon, lat):
     y = math.log(math.tan(math.pi / 4 + math.radians(lat) / 2))
     return x, y
 
+def js_literal_to_json(text):
+    # events-data.js is hand-written JS: unquoted keys, single quotes, trailing commas.
+    # Walk it once, copying strings verbatim so their contents are never rewritten.
+    out = []
+    i = 0
+    n = len(text)
+    while i < n:
+        c = text[i]
+        if c in '"\'':
+            j = i + 1
+            buf = []
+            while text[j] != c:
+                if text[j] == '\\':
+                    buf.append(text[j:j + 2])
+                    j += 2
+                    continue
+                buf.append('\\"' if text[j] == '"' else text[j])
+                j += 1
+            out.append('"' + ''.join(buf) + '"')
+            i = j + 1
+        elif c == '/' and text[i + 1:i + 2] == '/':
+            while i < n and text[i] != '\n':
+                i += 1
+        elif c.isalpha() or c == '_':
+            j = i
+            while j < n and (text[j].isalnum() or text[j] == '_'):
+                j += 1
+            word = text[i:j]
+            k = j
+            while k < n and text[k].isspace():
+                k += 1
+            if k < n and text[k] == ':':
+                out.append(json.dumps(word))
+            else:
+                out.append(word)
+            i = j
+        elif c == ',':
+            k = i + 1
+            while k < n and text[k].isspace():
+                k += 1
+            if k < n and text[k] in '}]':
+                i += 1
+                continue
+            out.append(c)
+            i += 1
+        else:
+            out.append(c)
+            i += 1
+    return ''.join(out)
+
+def load_events(filepath):
+    with open(filepath, 'r', encoding='utf-8') as f:
+        source = f.read()
+    start = source.index('{', source.index('EVENT_DATA'))
+    # Match the closing brace of the EVENT_DATA literal
+    depth = 0
+    for end in range(start, len(source)):
+        if source[end] == '{':
+            depth += 1
+        elif source[end] == '}':
+            depth -= 1
+            if depth == 0:
+                break
+    return json.loads(js_literal_to_json(source[start:end + 1]))
+
 def get_bounds(features):
     min_x, min_y = float('inf'), float('inf')
     max_x, max_y = float('-inf'), float('-inf')
@@ -83,6 +186,15 @@ def point_in_polygon(x, y, poly_points):
         j = i
     return inside
 
+def svg_to_geo(sx, sy, bounds, scale, offsets):
+    min_mex, min_mey, _, _ = bounds
+    offset_x, offset_y = offsets
+    my = ((SVG_HEIGHT - sy) - offset_y) / scale + min_mey
+    mx = (sx - offset_x) / scale + min_mex
+    lon = math.degrees(mx)
+    lat = math.degrees(2 * (math.atan(math.exp(my)) - math.pi / 4))
+    return lon, lat
+
 def get_hokkaido_subregion(lat, lon):
     # Approximate split
     # Sapporo (Doo) is ~ 141.35, 43.06
@@ -99,49 +211,70 @@ def get_hokkaido_subregion(lat, lon):
     else:
         return '道央' # Doo (Central)
 
-def generate_dots(features, bounds, scale, offsets, spacing, is_detail=False):
-    min_mex, min_mey, max_mex, max_mey = bounds
+class LatticeOccupancy:
+    # Dot positions of one resolution that are already taken, with the
+    # prefecture that owns each. Shared by every generate_dots call of that
+    # resolution so a lattice point inside two rings (shared prefecture edges,
+    # overlapping MultiPolygon parts) yields a single dot. Features are processed
+    # in ascending prefecture id, so the first claim wins = lowest prefecture id
+    # (then earlier polygon) wins.
+    # Keyed on the stored (rounded) coordinates rather than lattice cells:
+    # adaptive density mixes spacings, and a cell sized by the base spacing
+    # would merge distinct points of a finer per-prefecture lattice.
+    def __init__(self):
+        self.owners = {}
+        self.duplicates = 0 # Points dropped because another prefecture owns them
+
+    def claim(self, px, py, owner):
+        key = (round(px, 1), round(py, 1))
+        current = self.owners.get(key)
+        if current is None:
+            self.owners[key] = owner
+            return True
+        if current != owner:
+            self.duplicates += 1
+        return False
+
+def by_pref_id(features):
+    # Canonical processing order for lattice ownership, independent of file order
+    return sorted(features, key=lambda f: f['id'])
+
+def geo_to_svg(lon, lat, bounds, scale, offsets):
+    min_mex, min_mey, _, _ = bounds
     offset_x, offset_y = offsets
-    # Use global SVG_HEIGHT defined at module level
-    
-    dots = []
-    
-    # ...
-    # Shift map down by adding to offset_y or modifying sy
-    # sy = SVG_HEIGHT - ((my - min_mey) * scale + offset_y)
-    # To move DRAWING down (higher sy), we need smaller Y term or post-add
-    # Let's add a fixed pixel offset
-    GLOBAL_OFFSET_Y = 0  # Shift down by 40px
-    
-    def geo_to_svg(lon, lat):
-        mx, my = mercator_projection(lon, lat)
-        sx = (mx - min_mex) * scale + offset_x
-        # Normal calc
-        sy = SVG_HEIGHT - ((my - min_mey) * scale + offset_y)
-        # Shift down
-        return sx, sy + GLOBAL_OFFSET_Y
-        
-    def svg_to_geo(sx, sy):
-         # Reverse with offset
-         # sy_shifted = sy - GLOBAL_OFFSET_Y
-         sy_shifted = sy - GLOBAL_OFFSET_Y
-         
-         my = ((SVG_HEIGHT - sy_shifted) - offset_y) / scale + min_mey
-         mx = (sx - offset_x) / scale + min_mex
-         
-         lon = math.degrees(mx)
-         lat = math.degrees(2 * (math.atan(math.exp(my)) - math.pi / 4))
-         lat = math.degrees(2 * (math.atan(math.exp(my)) - math.pi / 4))
-         return lon, lat
+    mx, my = mercator_projection(lon, lat)
+    sx = (mx - min_mex) * scale + offset_x
+    sy = SVG_HEIGHT - ((my - min_mey) * scale + offset_y)
+    return sx, sy
+
+def compute_transform(bounds):
+    min_mex, min_mey, max_mex, max_mey = bounds
+    
+    geo_width = max_mex - min_mex
+    geo_height = max_mey - min_mey
+    
+    scale_x = SVG_WIDTH / geo_width
+    scale_y = SVG_HEIGHT / geo_height
+    scale = min(scale_x, scale_y) * MAP_FIT
+    
+    offset_x = (SVG_WIDTH - (geo_width * scale)) / 2
+    offset_y = (SVG_HEIGHT - (geo_height * scale)) / 2
+    return scale, (offset_x, offset_y)
+
+def ring_bbox(svg_ring):
+    xs = [p[0] for p in svg_ring]
+    ys = [p[1] for p in svg_ring]
+    return min(xs), min(ys), max(xs), max(ys)
 
+def project_features(features, bounds, scale, offsets):
+    # Outer rings of every prefecture polygon in SVG space, with their bboxes.
+    # Features without an id or with non-polygon geometry are dropped here.
+    projected = []
     for feature in features:
         props = feature['properties']
         pref_id = props.get('id')
         if not pref_id: continue
         
-        region = REGION_MAP.get(pref_id, 'Unknown')
-        pref_name = props.get('nam_ja', '')
-        
         geom = feature['geometry']
         if geom['type'] == 'Polygon':
             polys = [geom['coordinates']]
@@ -149,103 +282,484 @@ def generate_dots(features, bounds, scale, offsets, spacing, is_detail=False):
             polys = geom['coordinates']
         else:
             continue
+        
+        rings = [[geo_to_svg(p[0], p[1], bounds, scale, offsets) for p in poly[0]] for poly in polys]
+        projected.append({
+            'id': pref_id,
+            'name': props.get('nam_ja', ''),
+            'rings': rings,
+            'bboxes': [ring_bbox(ring) for ring in rings]
+        })
+    return projected
+
+def load_projected_geometry(filepath):
+    # Returns bounds, scale, offsets and projected features, from the cache when it is current
+    key = geometry_cache.cache_key(filepath, {
+        'svg_width': SVG_WIDTH, 'svg_height': SVG_HEIGHT, 'fit': MAP_FIT, 'projection': 'mercator'
+    })
+    cached = geometry_cache.load(GEOMETRY_CACHE, key)
+    if cached:
+        print("Using cached projected geometry...")
+        meta, rings = cached
+        projected = [
+            {'id': f['id'], 'name': f['name'], 'rings': [rings[i] for i in f['rings']],
+             'bboxes': [tuple(b) for b in f['bboxes']]}
+            for f in meta['features']
+        ]
+        return tuple(meta['bounds']), meta['scale'], tuple(meta['offsets']), projected
+    
+    print("Loading GeoJSON...")
+    features = load_geojson(filepath)['features']
+    
+    print("Calculating bounds...")
+    bounds = get_bounds(features)
+    scale, offsets = compute_transform(bounds)
+    
+    print("Projecting geometry...")
+    projected = project_features(features, bounds, scale, offsets)
+    
+    all_rings = []
+    meta_features = []
+    for f in projected:
+        meta_features.append({
+            'id': f['id'], 'name': f['name'],
+            'rings': list(range(len(all_rings), len(all_rings) + len(f['rings']))),
+            'bboxes': f['bboxes']
+        })
+        all_rings.extend(f['rings'])
+    geometry_cache.save(GEOMETRY_CACHE, key, {
+        'bounds': bounds, 'scale': scale, 'offsets': offsets, 'features': meta_features
+    }, all_rings)
+    return bounds, scale, offsets, projected
+
+def generate_dots(features, bounds, scale, offsets, spacing, is_detail=False, adaptive=False, occupancy=None,
+                  points_fn=None):
+    # features: projected prefectures from project_features / load_projected_geometry
+    # points_fn(svg_ring, bbox, spacing) yields the lattice points inside a ring (default lattice_points)
+    dots = DotStore()
+    
+    if occupancy is None:
+        occupancy = LatticeOccupancy()
+    if points_fn is None:
+        points_fn = lattice_points
+
+    for feature in by_pref_id(features):
+        pref_id = feature['id']
+        region = REGION_MAP.get(pref_id, 'Unknown')
+        pref_name = feature['name']
+        svg_rings = feature['rings']
+        bboxes = feature['bboxes']
+        
+        if adaptive:
+            pref_spacing, points = adaptive_points(svg_rings, bboxes, spacing, points_fn)
+        else:
+            pref_spacing = spacing
+            points = [pt for svg_ring, bbox in zip(svg_rings, bboxes)
+                      for pt in points_fn(svg_ring, bbox, spacing)]
+        
+        # Radius logic
+        radius = (pref_spacing / 2.0) * 0.8
+        
+        for px, py in points:
+            if not occupancy.claim(px, py, pref_id):
+                continue
             
-        for poly in polys:
-            outer_ring = poly[0]
-            svg_ring = [geo_to_svg(p[0], p[1]) for p in outer_ring]
-            
-            rmin_x = min(p[0] for p in svg_ring)
-            rmax_x = max(p[0] for p in svg_ring)
-            rmin_y = min(p[1] for p in svg_ring)
-            rmax_y = max(p[1] for p in svg_ring)
+            # Color/Name logic
+            display_name = pref_name
+            color_class_suffix = COLOR_CLASSES[pref_id % len(COLOR_CLASSES)]
             
-            start_x = math.floor(rmin_x / spacing) * spacing
-            end_x = math.ceil(rmax_x / spacing) * spacing
-            start_y = math.floor(rmin_y / spacing) * spacing
-            end_y = math.ceil(rmax_y / spacing) * spacing
+            if pref_id == 1:
+                lon, lat = svg_to_geo(px, py, bounds, scale, offsets)
+                subregion = get_hokkaido_subregion(lat, lon)
+                # display_name = subregion
+                # Subregion colors
+                sub_map = {'道南': 0, '道央': 1, '道北': 2, '道東': 3}
+                color_class_suffix = COLOR_CLASSES[sub_map.get(subregion, 0)]
             
-            # Generate grid points with float spacing
-            current_y = start_y
-            while current_y <= end_y:
-                current_x = start_x
-                while current_x <= end_x:
-                    px = current_x
-                    py = current_y
-                    
-                    if point_in_polygon(px, py, svg_ring):
-                        # Radius logic
-                        radius = (spacing / 2.0) * 0.8
-                        
-                        # Color/Name logic
-                        display_name = pref_name
-                        color_class_suffix = COLOR_CLASSES[pref_id % len(COLOR_CLASSES)]
-                        
-                        if pref_id == 1:
-                            lon, lat = svg_to_geo(px, py)
-                            subregion = get_hokkaido_subregion(lat, lon)
-                            # display_name = subregion
-                            # Subregion colors
-                            sub_map = {'道南': 0, '道央': 1, '道北': 2, '道東': 3}
-                            color_class_suffix = COLOR_CLASSES[sub_map.get(subregion, 0)]
-                        
-                        dots.append({
-                            'x': round(px, 1),
-                            'y': round(py, 1),
-                            'r': round(radius, 2),
-                            'region': region,
-                            'name': display_name,
-                            'color': color_class_suffix
-                        })
-                    
-                    current_x += spacing
-                current_y += spacing
+            dots.append(
+                round(px, 1), round(py, 1), round(radius, 2),
+                region, display_name, color_class_suffix
+            )
     return dots
 
-def main():
-    print("Loading GeoJSON...")
-    data = load_geojson(INPUT_FILE)
-    features = data['features']
+def lattice_points(svg_ring, bbox, spacing):
+    rmin_x, rmin_y, rmax_x, rmax_y = bbox
     
-    print("Calculating bounds...")
-    bounds = get_bounds(features)
-    min_mex, min_mey, max_mex, max_mey = bounds
+    start_x = math.floor(rmin_x / spacing) * spacing
+    end_x = math.ceil(rmax_x / spacing) * spacing
+    start_y = math.floor(rmin_y / spacing) * spacing
+    end_y = math.ceil(rmax_y / spacing) * spacing
     
-    geo_width = max_mex - min_mex
-    geo_height = max_mey - min_mey
+    # Generate grid points with float spacing
+    current_y = start_y
+    while current_y <= end_y:
+        current_x = start_x
+        while current_x <= end_x:
+            if point_in_polygon(current_x, current_y, svg_ring):
+                yield current_x, current_y
+            current_x += spacing
+        current_y += spacing
+
+def ring_centroid(svg_ring):
+    # Area-weighted centroid; vertex mean for degenerate (zero-area) rings
+    area2 = cx = cy = 0.0
+    j = len(svg_ring) - 1
+    for i in range(len(svg_ring)):
+        xi, yi = svg_ring[i]
+        xj, yj = svg_ring[j]
+        cross = xj * yi - xi * yj
+        area2 += cross
+        cx += (xj + xi) * cross
+        cy += (yj + yi) * cross
+        j = i
+    if abs(area2) < 1e-12:
+        return (sum(p[0] for p in svg_ring) / len(svg_ring),
+                sum(p[1] for p in svg_ring) / len(svg_ring))
+    return cx / (3 * area2), cy / (3 * area2)
+
+def adaptive_points(svg_rings, bboxes, spacing, points_fn=None):
+    # Coarsest spacing that still gives the prefecture MIN_DOTS_PER_PREFECTURE dots,
+    # so large prefectures get a sparse lattice and small/narrow ones a fine one.
+    if points_fn is None:
+        points_fn = lattice_points
+    for factor in ADAPTIVE_SPACING_FACTORS:
+        pref_spacing = spacing * factor
+        per_ring = [list(points_fn(svg_ring, bbox, pref_spacing)) for svg_ring, bbox in zip(svg_rings, bboxes)]
+        if sum(len(pts) for pts in per_ring) >= MIN_DOTS_PER_PREFECTURE:
+            break
     
-    scale_x = SVG_WIDTH / geo_width
-    scale_y = SVG_HEIGHT / geo_height
-    scale = min(scale_x, scale_y) * 0.9
+    points = [pt for pts in per_ring for pt in pts]
     
-    offset_x = (SVG_WIDTH - (geo_width * scale)) / 2
-    offset_y = (SVG_HEIGHT - (geo_height * scale)) / 2
-    offsets = (offset_x, offset_y)
+    # Rings too small for any lattice point (small islands) get one centroid dot,
+    # unless a dot already sits in the same lattice cell
+    taken = {(round(px / pref_spacing), round(py / pref_spacing)) for px, py in points}
+    for svg_ring, pts in zip(svg_rings, per_ring):
+        if pts:
+            continue
+        cx, cy = ring_centroid(svg_ring)
+        cell = (round(cx / pref_spacing), round(cy / pref_spacing))
+        if cell in taken:
+            continue
+        taken.add(cell)
+        points.append((cx, cy))
+    return pref_spacing, points
+
+def all_events_list(events):
+    # Same order as ALL_EVENTS in the map script; cluster trees index into it
+    return [dict(e, status='visited') for e in events['visited']] + \
+        [dict(e, status='wishlist') for e in events['wishlist']]
+
+def map_events_to_dots(dots, events, bounds, scale, offsets):
+    # Python mirror of mapEventsToDots: nearest same-prefecture dot within EVENT_MAX_DIST_SQ
+    dot_events = {}
+    geo = [svg_to_geo(dots.x_of(i), dots.y_of(i), bounds, scale, offsets) for i in range(len(dots))]
+
+    for index, e in enumerate(all_events_list(events)):
+        e['index'] = index
+        if not e.get('lat') or not e.get('lon'):
+            continue
+        nearest = None
+        min_d = float('inf')
+        for i in range(len(dots)):
+            name = dots.name_of(i)
+            if not name or name not in e['prefecture']:
+                continue
+            lon, lat = geo[i]
+            d = (lat - e['lat']) ** 2 + (lon - e['lon']) ** 2
+            if d < min_d:
+                min_d = d
+                nearest = i
+        if nearest is not None and min_d < EVENT_MAX_DIST_SQ:
+            dot_events.setdefault(nearest, []).append(e)
+    return dot_events
+
+def get_prefecture_status(pref_name, events):
+    # Python mirror of getPrefectureStatus in events-data.js
+    for status in ('visited', 'wishlist'):
+        if any(e['prefecture'] == pref_name or e['prefecture'] in pref_name for e in events[status]):
+            return status
+    return None
+
+def fmt_num(v):
+    # Shortest form, like JS number-to-string for our 1-2 decimal coordinates
+    return f'{v:.2f}'.rstrip('0').rstrip('.')
+
+def cluster_events(dots, dot_events, events, bounds, scale, offsets):
+    # Events that found a dot are clustered at their own projected position,
+    # within the region of that dot (unmatched events are not shown on the map)
+    points = []
+    for i, dot_event_list in dot_events.items():
+        for e in dot_event_list:
+            x, y = geo_to_svg(e['lon'], e['lat'], bounds, scale, offsets)
+            points.append((x, y, dots.region_of(i), e['index']))
+    tree = event_clusters.build_cluster_tree(points, CLUSTER_MAX_ZOOM, CLUSTER_RADIUS)
+    tree['fingerprint'] = event_clusters.events_fingerprint(all_events_list(events))
+    return tree
+
+def cluster_label(cluster_events_list, region):
+    # Mirror of clusterLabel: prefecture name when the cluster has a single one, else the region
+    prefectures = {e['prefecture'] for e in cluster_events_list}
+    place = next(iter(prefectures)) if len(prefectures) == 1 else NAME_JA_MAP.get(region, region)
+    return f"{place} ({len(cluster_events_list)})"
+
+def render_overview_labels(tree, events):
+    # Python mirror of renderOverviewLabels (zoom 0 clusters) so the prerendered labels match the hydrated ones
+    all_events = all_events_list(events)
+    labels = []
+    for x, y, region, indices in event_clusters.iter_level(tree, 0):
+        labels.append({
+            'text': cluster_label([all_events[k] for k in indices], region),
+            'x': x,
+            'y': y,
+            'region': region
+        })
+    labels.sort(key=lambda l: l['y'])
+
+    parts = ['<g id="overview-labels" class="fade-in-labels">']
+    last_bottom = float('-inf')
+    for l in labels:
+        label_y = max(l['y'], last_bottom + 12)
+        last_bottom = label_y
+        label_x = l['x'] + 40
+        parts.append(
+            f'<line x1="{fmt_num(l["x"])}" y1="{fmt_num(l["y"])}" x2="{fmt_num(label_x)}" '
+            f'y2="{fmt_num(label_y - 3)}" class="label-line"/>'
+        )
+        parts.append(
+            f'<text x="{fmt_num(label_x + 5)}" y="{fmt_num(label_y)}" class="label-text region-{l["region"]}">'
+            f'{html.escape(l["text"])}</text>'
+        )
+    parts.append('</g>')
+    return ''.join(parts) if labels else ''
+
+def overview_build_id(dots):
+    # Short hash of the overview payload, stamped on the prerendered SVG and the map
+    # script: a page is only hydrated by the script whose dot indices it was built with
+    digest = hashlib.sha256()
+    for chunk in dots.iter_json():
+        digest.update(chunk.encode('utf-8'))
+    return digest.hexdigest()[:12]
+
+def circles_path(circles):
+    # Path data drawing (x, y, r) circles as closed two-arc subpaths. Each subpath
+    # starts with a move relative to the previous start (mostly "m2 0" on the
+    # lattice), computed in integer hundredths so rounding never accumulates.
+    d = []
+    prev = None
+    for x, y, r in circles:
+        start = (round((x - r) * 100), round(y * 100))
+        if prev is None:
+            d.append(f"M{fmt_num(start[0] / 100)} {fmt_num(start[1] / 100)}")
+        else:
+            d.append(f"m{fmt_num((start[0] - prev[0]) / 100)} {fmt_num((start[1] - prev[1]) / 100)}")
+        prev = start
+        radius, diameter = fmt_num(r), fmt_num(r * 2)
+        d.append(f"a{radius} {radius} 0 1 0 {diameter} 0a{radius} {radius} 0 1 0 -{diameter} 0z")
+    return ''.join(d)
+
+def render_overview_svg(dots, dot_events, events, clusters, variant, build_id):
+    # Plain dots are batched into one path per prefecture and status, each dot a closed
+    # two-arc circle subpath, so they take the same fill/stroke rules as the client's
+    # circles while the whole overview costs a few dozen DOM nodes.
+    # Dots carrying events stay individual circles so they can be hydrated with handlers.
+    batches = {}
+    spots = []
+    status_cache = {}
+    for i in range(len(dots)):
+        name = dots.name_of(i)
+        if name not in status_cache:
+            status_cache[name] = get_prefecture_status(name, events)
+        status = status_cache[name]
+        if i in dot_events:
+            spots.append((i, status))
+            continue
+        key = (name, dots.region_of(i), status)
+        batches.setdefault(key, []).append((dots.x_of(i), dots.y_of(i), dots.r_of(i)))
+
+    parts = [
+        f'<svg id="japan-map" viewBox="0 0 {SVG_WIDTH} {SVG_HEIGHT}" '
+        f'xmlns="http://www.w3.org/2000/svg" data-prerendered="overview" data-variant="{variant}" '
+        f'data-build="{build_id}">'
+    ]
+    for (name, region, status), circles in batches.items():
+        class_name = f'prefecture dot-batch region-{region.lower()}'
+        if status:
+            class_name += f' prefecture-{status}'
+        parts.append(
+            f'<path class="{class_name}" data-name="{html.escape(name)}" data-region="{region}" '
+            f'd="{circles_path(circles)}"/>'
+        )
+    for i, status in spots:
+        dot = dots.record(i)
+        class_name = f"prefecture region-{dot['region'].lower()}"
+        if status:
+            class_name += f' prefecture-{status}'
+        has_visited = any(e['status'] == 'visited' for e in dot_events[i])
+        class_name += ' spot-visited' if has_visited else ' spot-wishlist'
+        parts.append(
+            f'<circle cx="{fmt_num(dot["x"])}" cy="{fmt_num(dot["y"])}" r="{fmt_num(dot["r"])}" '
+            f'class="{class_name}" data-index="{i}" data-name="{html.escape(dot["name"])}" '
+            f'data-region="{dot["region"]}"/>'
+        )
+    parts.append(render_overview_labels(clusters, events))
+    parts.append('</svg>')
+    return ''.join(parts)
+
+def inject_prerendered(page_path, svg_markup):
+    with open(page_path, 'r', encoding='utf-8') as f:
+        page = f.read()
+    start = page.find(PRERENDER_START)
+    end = page.find(PRERENDER_END)
+    if start == -1 or end == -1:
+        print(f"Warning: prerender markers not found in {page_path}, skipping")
+        return False
+    # Keep the marker lines and their indentation, replace everything between them
+    head = page[:start + len(PRERENDER_START)]
+    indent = page[page.rfind('\n', 0, end) + 1:end]
+    page = head + '\n' + indent + svg_markup + '\n' + indent + page[end:]
+    with atomic_open(page_path) as f:
+        f.write(page)
+    return True
+
+def use_variant_loader(page_path):
+    # Points the page's map script at the loader. Only done once every variant
+    # has been written, so a page is never deployed with a loader whose variant
+    # scripts don't exist; until then it keeps loading japan-map.js directly.
+    page_dir = os.path.dirname(page_path)
+    direct = f'<script src="{os.path.relpath(OUTPUT_FILE, page_dir)}"></script>'
+    loader = f'<script src="{os.path.relpath(LOADER_FILE, page_dir)}"></script>'
+    with open(page_path, 'r', encoding='utf-8') as f:
+        page = f.read()
+    if direct not in page:
+        return False
+    with atomic_open(page_path) as f:
+        f.write(page.replace(direct, loader))
+    return True
+
+def variant_output_path(name):
+    # The standard variant keeps the historical file name
+    if name == DEFAULT_VARIANT:
+        return OUTPUT_FILE
+    root, ext = os.path.splitext(OUTPUT_FILE)
+    return f"{root}.{name}{ext}"
+
+def build_variant(variant, features, bounds, scale, offsets, events):
+    name = variant['name']
+    dot_spacing = variant['dot_spacing']
+    detail_spacing = variant['detail_spacing']
+    output_file = variant_output_path(name)
+    print(f"== Variant {name} ==")
     
     # 1. Overview: Dense enough to capture Aomori
-    print(f"Generating Overview Dots (Spacing {DOT_SPACING})...") 
-    overview_dots = generate_dots(features, bounds, scale, offsets, DOT_SPACING, is_detail=False)
-    print(f"Overview Count: {len(overview_dots)}")
-    
-    # 2. Detail: High res
-    print(f"Generating Detail Dots (Spacing {DETAIL_SPACING})...") 
-    all_detail_dots = generate_dots(features, bounds, scale, offsets, DETAIL_SPACING, is_detail=True)
-    
-    detail_dots_by_region = {}
-    for dot in all_detail_dots:
-        r = dot['region']
-        if r not in detail_dots_by_region:
-            detail_dots_by_region[r] = []
-        detail_dots_by_region[r].append(dot)
-    
-    map_data = {
-        'overview': overview_dots,
-        'regions': detail_dots_by_region
-    }
-    
-    js_content = f"""// Japan Map Dot Pattern Generator (GeoJSON Source - Multi-Res + Region Colors + Single Dot + Popup)
-document.addEventListener('DOMContentLoaded', () => {{
-    initMap();
-}});
+    print(f"Generating Overview Dots (Spacing {dot_spacing})...") 
+    overview_occupancy = LatticeOccupancy()
+    overview_dots = generate_dots(features, bounds, scale, offsets, dot_spacing, is_detail=False,
+                                  adaptive=ADAPTIVE_DENSITY, occupancy=overview_occupancy)
+    print(f"Overview Count: {len(overview_dots)} ({overview_occupancy.duplicates} duplicate border dots removed)")
+    
+    # 2. Event cluster tree, shipped with the dots; the client draws only the current zoom level
+    dot_events = map_events_to_dots(overview_dots, events, bounds, scale, offsets)
+    clusters = cluster_events(overview_dots, dot_events, events, bounds, scale, offsets)
+    print(f"Event Clusters: {len(clusters['order'])} events, "
+          f"{len(clusters['levels'][0]) // event_clusters.FIELDS_PER_CLUSTER} at overview zoom")
+    
+    # 3. Prerender the overview into the events page for first paint without JS
+    # (one variant only; the others re-render client-side when they are picked)
+    build_id = overview_build_id(overview_dots)
+    if name == DEFAULT_VARIANT:
+        print(f"Prerendering overview into {EVENTS_PAGE}...")
+        inject_prerendered(EVENTS_PAGE, render_overview_svg(overview_dots, dot_events, events, clusters, name, build_id))
+    
+    js_head, js_tail = split_template(render_js_template(bounds, scale, offsets, name, build_id), MAP_DATA_PLACEHOLDER)
+    
+    # 4. Stream the script: head, overview, then detail dots one region at a time
+    # as they are generated, so only a single region's dots are alive at once.
+    print(f"Writing {output_file}...")
+    with atomic_open(output_file) as f:
+        f.write(js_head)
+        f.write('{"overview": ')
+        write_chunks(f, overview_dots.iter_json())
+        del overview_dots
+        
+        print(f"Generating Detail Dots (Spacing {detail_spacing})...") 
+        f.write(', "regions": {')
+        first = True
+        detail_count = 0
+        detail_occupancy = LatticeOccupancy()
+        for region, region_features in features_by_region(features).items():
+            region_dots = generate_dots(region_features, bounds, scale, offsets, detail_spacing, is_detail=True,
+                                        adaptive=ADAPTIVE_DENSITY, occupancy=detail_occupancy)
+            detail_count += len(region_dots)
+            if not len(region_dots):
+                continue
+            if not first:
+                f.write(', ')
+            first = False
+            f.write(json.dumps(region, ensure_ascii=False) + ': ')
+            write_chunks(f, region_dots.iter_json())
+        f.write('}, "clusters": ')
+        f.write(json.dumps(clusters, separators=(',', ':'), ensure_ascii=False))
+        f.write('}')
+        f.write(js_tail)
+    print(f"Detail Count: {detail_count} ({detail_occupancy.duplicates} duplicate border dots removed)")
+
+def render_loader():
+    # Picks a variant from the device pixels the map can actually show
+    # (map container is capped at MAP_MAX_CSS_WIDTH CSS px) and loads its script.
+    table = [
+        {'src': os.path.basename(variant_output_path(v['name'])), 'maxDevicePx': v['max_device_px']}
+        for v in MAP_VARIANTS
+    ]
+    return f"""// Japan Map Variant Loader (generated by process_geojson.py)
+(function () {{
+    const VARIANTS = {json.dumps(table)};
+    const cssWidth = Math.min(window.innerWidth || document.documentElement.clientWidth, {MAP_MAX_CSS_WIDTH});
+    const devicePx = cssWidth * Math.min(window.devicePixelRatio || 1, 2);
+    const pick = VARIANTS.find(v => v.maxDevicePx === null || devicePx <= v.maxDevicePx) || VARIANTS[VARIANTS.length - 1];
+    
+    // Resolve relative to this loader so it works from any page depth
+    const loader = document.currentScript;
+    const base = loader.src.replace(/[^/]*$/, '');
+    
+    function load(src, fallback) {{
+        const script = document.createElement('script');
+        script.src = base + src;
+        script.async = false; // Keep execution order with other dynamically added scripts
+        // A variant that was not deployed falls back to the standard map
+        if (fallback && fallback !== src) script.onerror = () => load(fallback, null);
+        loader.after(script);
+    }}
+    load(pick.src, {json.dumps(os.path.basename(OUTPUT_FILE))});
+}})();
+"""
+
+def main():
+    # Projection and rasterization prep (rings + bboxes) are shared by all variants
+    bounds, scale, offsets, features = load_projected_geometry(INPUT_FILE)
+    events = load_events(EVENTS_FILE)
+    
+    for variant in MAP_VARIANTS:
+        build_variant(variant, features, bounds, scale, offsets, events)
+    
+    print(f"Writing {LOADER_FILE}...")
+    with atomic_open(LOADER_FILE) as f:
+        f.write(render_loader())
+    if use_variant_loader(EVENTS_PAGE):
+        print(f"Switched {EVENTS_PAGE} to {LOADER_FILE}")
+    service_worker.write_service_worker()
+    print("Done!")
+
+def features_by_region(features):
+    # Same order as generate_dots, so regions stream in prefecture id order
+    groups = {}
+    for feature in by_pref_id(features):
+        groups.setdefault(REGION_MAP.get(feature['id'], 'Unknown'), []).append(feature)
+    return groups
+
+def render_js_template(bounds, scale, offsets, variant, build_id):
+    min_mex, min_mey, _, _ = bounds
+    offset_x, offset_y = offsets
+    return f"""// Japan Map Dot Pattern Generator (GeoJSON Source - Multi-Res + Region Colors + Single Dot + Popup)
 
 // Initialize modal handlers after a short delay to ensure DOM is ready
 setTimeout(() => {{
@@ -257,8 +771,17 @@ setTimeout(() => {{
 // Global debug for status
 window.debugPrefStatus = true;
 
+const MAP_VARIANT = '{variant}';
+const MAP_BUILD = '{build_id}'; // Matches data-build of the overview prerendered with this data
 let currentMapData = null;
 const EVENT_DATA_REF = typeof EVENT_DATA !== 'undefined' ? EVENT_DATA : {{ visited: [], wishlist: [] }};
+// Event order shared with the build: cluster trees index into this list
+const ALL_EVENTS = [
+    ...EVENT_DATA_REF.visited.map(e => ({{...e, status: 'visited'}})),
+    ...EVENT_DATA_REF.wishlist.map(e => ({{...e, status: 'wishlist'}}))
+];
+
+const REGION_NAMES_JA = {json.dumps(NAME_JA_MAP, ensure_ascii=False)};
 
 const MAP_CONFIG = {{
     minMex: {min_mex},
@@ -278,16 +801,11 @@ function svgToGeo(sx, sy) {{
 }}
 
 function mapEventsToDots(dots) {{
-    const allEvents = [
-        ...EVENT_DATA_REF.visited.map(e => ({{...e, status: 'visited'}})),
-        ...EVENT_DATA_REF.wishlist.map(e => ({{...e, status: 'wishlist'}}))
-    ];
-    
     dots.forEach(d => d.events = []);
 
     const MAX_DIST_SQ = 0.05; // Approx 0.22 deg (~25km) squared. Prevents cross-region assignment.
 
-    allEvents.forEach(e => {{
+    ALL_EVENTS.forEach(e => {{
         if (!e.lat || !e.lon) return;
         
         let nearest = null;
@@ -314,16 +832,77 @@ function mapEventsToDots(dots) {{
     }});
 }}
 
+function eventsFingerprint(events) {{
+    // 32-bit FNV-1a, mirrored by event_clusters.events_fingerprint
+    let h = 0x811c9dc5;
+    events.forEach(e => {{
+        const line = `${{e.name}}|${{e.lat}}|${{e.lon}}\n`;
+        for (let i = 0; i < line.length; i++) {{
+            h ^= line.charCodeAt(i);
+            h = Math.imul(h, 0x01000193) >>> 0;
+        }}
+    }});
+    return h >>> 0;
+}}
+
+function clusterTree() {{
+    // The build-time tree only applies to the event data it was built from
+    const tree = currentMapData.clusters;
+    if (!tree) return null;
+    if (tree.valid === undefined) tree.valid = tree.fingerprint === eventsFingerprint(ALL_EVENTS);
+    return tree.valid ? tree : null;
+}}
+
+function clustersInView(minX, minY, width, height, regionName, fallbackDots) {{
+    // Clusters of the zoom level matching this viewBox, limited to the view (and region)
+    const tree = clusterTree();
+    if (!tree) {{
+        // Stale or missing tree: one cluster per event dot
+        return fallbackDots
+            .filter(d => d.events && d.events.length > 0)
+            .map(d => ({{ x: d.x, y: d.y, region: d.region, events: d.events }}));
+    }}
+    
+    const zoom = Math.log2({SVG_WIDTH} / width);
+    const level = tree.levels[Math.max(0, Math.min(tree.levels.length - 1, Math.floor(zoom + 1e-9)))];
+    const clusters = [];
+    for (let i = 0; i < level.length; i += 5) {{
+        const x = level[i], y = level[i + 1];
+        if (x < minX || x > minX + width || y < minY || y > minY + height) continue;
+        const region = tree.regions[level[i + 4]];
+        if (regionName && region !== regionName) continue;
+        const start = level[i + 2];
+        const events = tree.order.slice(start, start + level[i + 3]).map(k => ALL_EVENTS[k]);
+        clusters.push({{ x, y, region, events }});
+    }}
+    return clusters;
+}}
+
+function clusterLabel(events, region) {{
+    // Prefecture name when the cluster has a single one, else the region
+    const prefectures = new Set(events.map(e => e.prefecture));
+    const place = prefectures.size === 1 ? events[0].prefecture : (REGION_NAMES_JA[region] || region);
+    return `${{place}} (${{events.length}})`;
+}}
+
 function initMap() {{
     const mapSvg = document.getElementById('japan-map');
     if (!mapSvg) return;
     
-    currentMapData = {json.dumps(map_data, ensure_ascii=False)};
+    currentMapData = {MAP_DATA_PLACEHOLDER};
     
     mapEventsToDots(currentMapData.overview);
     Object.values(currentMapData.regions).forEach(dots => mapEventsToDots(dots));
     
-    renderDots(currentMapData.overview, false);
+    if (mapSvg.dataset.prerendered === 'overview' && mapSvg.dataset.variant === MAP_VARIANT &&
+        mapSvg.dataset.build === MAP_BUILD && clusterTree()) {{
+        // Overview markup was injected at build time from this data; only attach behaviour.
+        // A page and script from different builds (e.g. a cached script after a deploy), or
+        // events-data.js edited since the build (stale spots and statuses), re-render instead.
+        hydrateOverview(mapSvg);
+    }} else {{
+        renderDots(currentMapData.overview, false);
+    }}
     renderOverviewLabels();
     
     // Setup reset button
@@ -386,40 +965,16 @@ function renderDots(dots, usePrefColor) {{
              }}
         }}
 
-        // 2. Spot Status & Interaction
+        // 2. Spot Status
         if (dot.events && dot.events.length > 0) {{
             const hasVisited = dot.events.some(e => e.status === 'visited');
             className += hasVisited ? ' spot-visited' : ' spot-wishlist';
-            
-            circle.addEventListener('click', (e) => {{
-                e.stopPropagation();
-                openModal(dot.events);
-            }});
-        }} else {{
-            circle.addEventListener('click', (e) => {{
-                e.stopPropagation();
-                zoomToRegion(dot.region);
-            }});
         }}
         
         circle.setAttribute('class', className);
         circle.setAttribute('data-name', dot.name);
         circle.setAttribute('data-region', dot.region);
-        
-        // Tooltip: Show Event Name inside
-        circle.addEventListener('mouseenter', (e) => {{
-            let tooltipText = dot.name;
-            if (dot.events && dot.events.length > 0) {{
-                 const status = dot.events.some(ev => ev.status === 'visited') ? '参加済み' : 'いつか参加したい';
-                 // Format: "Prefecture | EventName (Status)" or just EventName
-                 // User said: "In the speech bubble... display event name"
-                 tooltipText = `${{dot.name}} | ${{dot.events[0].name}} (${{status}})`;
-                 if (dot.events.length > 1) tooltipText += ' +';
-            }}
-            showTooltip(e, tooltipText);
-        }});
-        
-        circle.addEventListener('mouseleave', hideTooltip);
+        bindDot(circle, dot);
         
         frag.appendChild(circle);
     }});
@@ -427,13 +982,63 @@ function renderDots(dots, usePrefColor) {{
     mapSvg.appendChild(frag);
 }}
 
+function bindDot(circle, dot) {{
+    // Interaction
+    if (dot.events && dot.events.length > 0) {{
+        circle.addEventListener('click', (e) => {{
+            e.stopPropagation();
+            openModal(dot.events);
+        }});
+    }} else {{
+        circle.addEventListener('click', (e) => {{
+            e.stopPropagation();
+            zoomToRegion(dot.region);
+        }});
+    }}
+    
+    // Tooltip: Show Event Name inside
+    circle.addEventListener('mouseenter', (e) => {{
+        let tooltipText = dot.name;
+        if (dot.events && dot.events.length > 0) {{
+             const status = dot.events.some(ev => ev.status === 'visited') ? '参加済み' : 'いつか参加したい';
+             // Format: "Prefecture | EventName (Status)" or just EventName
+             // User said: "In the speech bubble... display event name"
+             tooltipText = `${{dot.name}} | ${{dot.events[0].name}} (${{status}})`;
+             if (dot.events.length > 1) tooltipText += ' +';
+        }}
+        showTooltip(e, tooltipText);
+    }});
+    
+    circle.addEventListener('mouseleave', hideTooltip);
+}}
+
+function hydrateOverview(mapSvg) {{
+    // Event spots are individual circles indexed into currentMapData.overview
+    mapSvg.querySelectorAll('circle[data-index]').forEach(circle => {{
+        const dot = currentMapData.overview[parseInt(circle.dataset.index, 10)];
+        if (dot) bindDot(circle, dot);
+    }});
+    
+    // Plain dots are batched into one path per prefecture: click zooms to its region, hover names it
+    mapSvg.querySelectorAll('.dot-batch').forEach(batch => {{
+        const region = batch.dataset.region;
+        batch.addEventListener('click', (e) => {{
+            e.stopPropagation();
+            zoomToRegion(region);
+        }});
+        batch.addEventListener('mouseenter', (e) => showTooltip(e, batch.dataset.name));
+        batch.addEventListener('mouseleave', hideTooltip);
+    }});
+    
+    delete mapSvg.dataset.prerendered;
+}}
+
 function zoomToRegion(regionName) {{
     const mapSvg = document.getElementById('japan-map');
     const regionDots = currentMapData.regions[regionName];
     if (!regionDots || regionDots.length === 0) return;
     
     renderDots(regionDots, true);
-    renderZoomLabels(regionDots, regionName); // Show annotations
     
     // Remove Overview Labels
     const ovLabels = document.getElementById('overview-labels');
@@ -455,13 +1060,16 @@ function zoomToRegion(regionName) {{
     const height = maxY - minY + (padding * 2);
     const viewBox = `${{minX - padding}} ${{minY - padding}} ${{width}} ${{height}}`;
     
+    // Show annotations for the event clusters of this zoom level
+    renderZoomLabels(clustersInView(minX - padding, minY - padding, width, height, regionName, regionDots), regionName);
+    
     mapSvg.style.transition = 'all 0.8s cubic-bezier(0.25, 1, 0.5, 1)';
     mapSvg.setAttribute('viewBox', viewBox);
     
     document.getElementById('reset-zoom').style.display = 'block';
 }}
 
-function renderZoomLabels(regionDots, regionName) {{
+function renderZoomLabels(eventDots, regionName) {{
     const mapSvg = document.getElementById('japan-map');
     let group = document.getElementById('zoom-labels');
     if (group) group.remove();
@@ -469,8 +1077,7 @@ function renderZoomLabels(regionDots, regionName) {{
     group = document.createElementNS('http://www.w3.org/2000/svg', 'g');
     group.id = 'zoom-labels';
     
-    // Get all event dots and sort by Y
-    const eventDots = regionDots.filter(d => d.events && d.events.length > 0);
+    // Event clusters (x, y, events), top to bottom
     eventDots.sort((a, b) => a.y - b.y);
 
     const lineHeight = 7;
@@ -545,37 +1152,14 @@ function renderOverviewLabels() {{
     let group = document.getElementById('overview-labels');
     if (group) group.remove();
     
-    const eventDots = currentMapData.overview.filter(d => d.events && d.events.length > 0);
-    if (eventDots.length === 0) return;
+    // 1. Event clusters of the overview zoom level
+    const labels = clustersInView(0, 0, {SVG_WIDTH}, {SVG_HEIGHT}, null, currentMapData.overview);
+    if (labels.length === 0) return;
 
     group = document.createElementNS('http://www.w3.org/2000/svg', 'g');
     group.id = 'overview-labels';
     group.classList.add('fade-in-labels');
 
-    // 1. Group by Prefecture to find Centers
-    const prefGroups = {{}};
-    eventDots.forEach(d => {{
-        if (!prefGroups[d.name]) prefGroups[d.name] = [];
-        prefGroups[d.name].push(d);
-    }});
-    
-    let labels = [];
-    Object.keys(prefGroups).forEach(prefName => {{
-        const dots = prefGroups[prefName];
-        const centerX = dots.reduce((sum, d) => sum + d.x, 0) / dots.length;
-        const centerY = dots.reduce((sum, d) => sum + d.y, 0) / dots.length;
-        const allEvents = dots.flatMap(d => d.events);
-        
-        labels.push({{
-            name: prefName,
-            count: allEvents.length,
-            events: allEvents,
-            x: centerX,
-            y: centerY,
-            region: dots[0].region
-        }});
-    }});
-
     // 2. Sort by Y to process from top to bottom
     labels.sort((a, b) => a.y - b.y);
 
@@ -612,7 +1196,7 @@ function renderOverviewLabels() {{
         text.setAttribute('x', labelX + 5);
         text.setAttribute('y', labelY);
         text.setAttribute('class', 'label-text region-' + l.region);
-        text.textContent = `${{l.name}} (${{l.count}})`;
+        text.textContent = clusterLabel(l.events, l.region);
         
         text.onclick = (e) => {{
             e.stopPropagation();
@@ -744,12 +1328,17 @@ function showTooltip(event, text) {{
 function hideTooltip() {{
     if (tooltip) tooltip.style.display = 'none';
 }}
-"""
 
-    
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        f.write(js_content)
-    print("Done!")
+// Bootstrap last: initMap needs the let/const declarations above
+// Loaded dynamically by japan-map-loader.js, so the DOM may already be ready
+if (document.readyState === 'loading') {{
+    document.addEventListener('DOMContentLoaded', () => {{
+        initMap();
+    }});
+}} else {{
+    initMap();
+}}
+"""
 
 if __name__ == "__main__":
     main()
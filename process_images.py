@@ -0,0 +1,258 @@
+import argparse
+import hashlib
+import html
+import json
+import os
+import re
+import sys
+
+import service_worker
+from map_writer import atomic_open
+
+try:
+    from PIL import Image, ImageSequence
+except ImportError:
+    Image = None
+
+try:
+    import pillow_avif # noqa: F401 (registers the AVIF plugin on Pillow < 11.2)
+except ImportError:
+    pass
+
+# Image optimization stage: writes resized AVIF/WebP variants of the images
+# used on the pages below and rewrites their <img> tags into <picture>
+# elements with srcset, so browsers fetch the smallest suitable file.
+# Variant names carry the source's content hash; unchanged images are skipped.
+# Usage: python process_images.py [--force] [--no-rewrite]
+
+# Configuration
+PAGES = ['home/index.html', 'events/index.html']
+OUTPUT_DIR = 'assets/img/optimized'
+MANIFEST_FILE = 'assets/img/optimized/manifest.json' # Source -> hash + variants; read by the page rewrite
+IMAGE_WIDTHS = (160, 320, 640, 1280) # Plus the original width, never upscaled
+ENCODER_VERSION = 1 # Bump to re-encode everything after changing the settings below
+
+# Output formats in <source> order (best compression first) with Pillow save options
+FORMATS = [
+    ('avif', 'image/avif', {'quality': 55, 'speed': 6}),
+    ('webp', 'image/webp', {'quality': 80, 'method': 6}),
+]
+
+# Rendered width of each image class (see style.css), used for the sizes attribute
+IMAGE_SIZES = {
+    'logo-img': '50px', # height: 50px, square GIF
+    'biitsz-img': '(max-width: 571px) 200px, (max-width: 1428px) 35vw, 500px', # .biitsz-container
+    'work-thumb-img': '(max-width: 600px) 85vw, 400px', # 250px high card thumbnail
+}
+DEFAULT_SIZES = '100vw'
+
+# Above-the-fold images stay eager; lazy-loading them would delay the first paint
+EAGER_CLASSES = {'logo-img', 'biitsz-img'}
+
+IMG_TAG = re.compile(r'<picture data-optimized>.*?(<img\b[^>]*>)\s*</picture>|(<img\b[^>]*>)', re.S)
+ATTR = re.compile(r'([\w-]+)="([^"]*)"')
+
+def available_formats():
+    Image.init()
+    formats = []
+    for ext, mime, options in FORMATS:
+        if ext.upper() in Image.SAVE:
+            formats.append((ext, mime, options))
+        else:
+            print(f"Warning: Pillow has no {ext.upper()} support, skipping {ext} variants")
+    return formats
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def variant_key(source_hash, formats):
+    # Encoder settings are part of the key, so changing them re-encodes
+    params = {'widths': IMAGE_WIDTHS, 'formats': formats, 'version': ENCODER_VERSION}
+    digest = hashlib.sha256(source_hash.encode('ascii'))
+    digest.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+def target_widths(width):
+    return [w for w in IMAGE_WIDTHS if w < width] + [width]
+
+def find_page_images(pages):
+    # Repo-relative paths of every local image referenced by an <img> on the pages
+    sources = []
+    for page in pages:
+        with open(page, 'r', encoding='utf-8') as f:
+            content = f.read()
+        for m in IMG_TAG.finditer(content):
+            attrs = dict(ATTR.findall(m.group(1) or m.group(2)))
+            src = attrs.get('src', '')
+            if not src or '://' in src or src.startswith('data:'):
+                continue
+            path = os.path.normpath(os.path.join(os.path.dirname(page), html.unescape(src)))
+            if os.path.exists(path) and path not in sources:
+                sources.append(path)
+    return sources
+
+def has_alpha(im):
+    return im.mode in ('RGBA', 'LA', 'PA') or 'transparency' in im.info
+
+def encode_variant(im, width, ext, options, out_path):
+    height = max(1, round(im.height * width / im.width))
+    options = dict(options)
+    if getattr(im, 'is_animated', False):
+        # Animated GIFs stay animated: every frame is resized and re-encoded
+        frames, durations = [], []
+        for frame in ImageSequence.Iterator(im):
+            durations.append(frame.info.get('duration', 100))
+            frames.append(frame.convert('RGBA').resize((width, height), Image.LANCZOS))
+        first = frames[0]
+        options.update(save_all=True, append_images=frames[1:], duration=durations, loop=im.info.get('loop', 0))
+    else:
+        first = im.convert('RGBA' if has_alpha(im) else 'RGB')
+        if width != im.width:
+            first = first.resize((width, height), Image.LANCZOS)
+
+    tmp_path = out_path + '.tmp'
+    try:
+        first.save(tmp_path, format=ext.upper(), **options)
+        os.replace(tmp_path, out_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+    return os.path.getsize(out_path)
+
+def optimize_image(path, entry, formats, force=False):
+    # Returns the manifest entry for path, re-encoding only when the key changed
+    key = variant_key(file_hash(path), formats)
+    if entry and entry['key'] == key and not force:
+        files = [v['file'] for vs in entry['variants'].values() for v in vs]
+        if all(os.path.exists(os.path.join(OUTPUT_DIR, f)) for f in files):
+            print(f"  {path}: unchanged, skipped")
+            return entry, False
+
+    stem = os.path.splitext(os.path.basename(path))[0]
+    variants = {}
+    with Image.open(path) as im:
+        width, height = im.size
+        for ext, _, options in formats:
+            variants[ext] = []
+            for w in target_widths(width):
+                name = f"{stem}.{key[:10]}-{w}.{ext}"
+                size = encode_variant(im, w, ext, options, os.path.join(OUTPUT_DIR, name))
+                variants[ext].append({'file': name, 'width': w, 'bytes': size})
+
+    original = os.path.getsize(path)
+    best = min(v['bytes'] for v in variants[formats[0][0]]) if formats else original
+    print(f"  {path}: {width}x{height}, {original:,} bytes -> smallest {best:,} bytes")
+    return {'key': key, 'width': width, 'height': height, 'variants': variants}, True
+
+def prune_outputs(manifest):
+    # Drop variants of older content hashes or settings
+    keep = {v['file'] for entry in manifest.values() for vs in entry['variants'].values() for v in vs}
+    keep.add(os.path.basename(MANIFEST_FILE))
+    removed = 0
+    for name in os.listdir(OUTPUT_DIR):
+        if name not in keep and not name.startswith('.'):
+            os.unlink(os.path.join(OUTPUT_DIR, name))
+            removed += 1
+    return removed
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def render_picture(img_tag, entry, page_dir, indent):
+    attrs = ATTR.findall(img_tag)
+    values = dict(attrs)
+    classes = values.get('class', '').split()
+    sizes = next((IMAGE_SIZES[c] for c in classes if c in IMAGE_SIZES), DEFAULT_SIZES)
+    eager = any(c in EAGER_CLASSES for c in classes)
+
+    lines = ['<picture data-optimized>']
+    for ext, mime, _ in FORMATS:
+        if ext not in entry['variants']:
+            continue
+        srcset = ', '.join(
+            f"{os.path.relpath(os.path.join(OUTPUT_DIR, v['file']), page_dir).replace(os.sep, '/')} {v['width']}w"
+            for v in entry['variants'][ext]
+        )
+        lines.append(f'    <source type="{mime}" srcset="{html.escape(srcset)}" sizes="{sizes}">')
+
+    # The original file stays as the <img> fallback; existing attributes keep their order
+    managed = {'loading': 'eager' if eager else 'lazy', 'decoding': 'async'}
+    merged = [(k, v) for k, v in attrs if k not in managed]
+    merged += list(managed.items())
+    lines.append('    <img ' + ' '.join(f'{k}="{v}"' for k, v in merged) + '>')
+    lines.append('</picture>')
+    return ('\n' + indent).join(lines)
+
+def rewrite_page(page, manifest):
+    with open(page, 'r', encoding='utf-8') as f:
+        content = f.read()
+    page_dir = os.path.dirname(page)
+    count = 0
+
+    def replace(m):
+        nonlocal count
+        img_tag = m.group(1) or m.group(2)
+        src = dict(ATTR.findall(img_tag)).get('src', '')
+        path = os.path.normpath(os.path.join(page_dir, html.unescape(src)))
+        entry = manifest.get(path.replace(os.sep, '/'))
+        if not entry:
+            return m.group(0)
+        line_start = content.rfind('\n', 0, m.start()) + 1
+        indent = content[line_start:m.start()]
+        if indent.strip():
+            indent = ''
+        count += 1
+        return render_picture(img_tag, entry, page_dir, indent)
+
+    updated = IMG_TAG.sub(replace, content)
+    if updated != content:
+        with atomic_open(page) as f:
+            f.write(updated)
+    return count
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write AVIF/WebP image variants and srcset markup for the site pages.")
+    parser.add_argument('--force', action='store_true', help="re-encode even when the content hash is unchanged")
+    parser.add_argument('--no-rewrite', action='store_true', help="only write variants, leave the pages untouched")
+    args = parser.parse_args(argv)
+
+    if Image is None:
+        print("Error: Pillow is required for image optimization (pip install Pillow)")
+        return 1
+    formats = available_formats()
+    if not formats:
+        print("Error: Pillow was built without AVIF and WebP support")
+        return 1
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    old_manifest = load_manifest(MANIFEST_FILE)
+    manifest = {}
+    encoded = 0
+    print(f"Optimizing images referenced by {', '.join(PAGES)}...")
+    for path in find_page_images(PAGES):
+        key = path.replace(os.sep, '/')
+        manifest[key], changed = optimize_image(path, old_manifest.get(key), formats, args.force)
+        encoded += changed
+
+    with atomic_open(MANIFEST_FILE) as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+    removed = prune_outputs(manifest)
+    print(f"Encoded {encoded} image(s), {len(manifest) - encoded} unchanged, {removed} stale file(s) removed")
+
+    if not args.no_rewrite:
+        for page in PAGES:
+            print(f"  {page}: {rewrite_page(page, manifest)} <img> tag(s) with srcset")
+        service_worker.write_service_worker() # The events page is precached
+    print("Done!")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
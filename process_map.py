@@ -1,42 +1,77 @@
 
+import argparse
+import json
+import mmap
 import struct
 import os
 import math
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import service_worker
+from dot_store import DotStore
+from map_writer import atomic_open, split_template, write_chunks
+from png_reader import is_png, iter_png_rows, read_png_header
 
 # Configuration
-INPUT_BMP = 'assets/img/japan_map_base.bmp'
+INPUT_IMAGE = 'assets/img/japan_map_base.bmp' # 24/32-bit BMP or PNG (detected by signature)
 OUTPUT_JS = 'assets/js/japan-map.js'
 DOT_SPACING = 4  # Reduced from 7 for finer detail
 THRESHOLD = 200   # Pixel brightness threshold (0-255) for "black" (land)
+DOTS_PLACEHOLDER = '/*@@DOTS@@*/' # Where the streamed dot payload goes in the template
+REGIONS_PLACEHOLDER = '/*@@REGIONS@@*/' # Per-region dot index range + bounding box
 
-def read_bmp(filepath):
-    # ... (same as before) ...
-    with open(filepath, 'rb') as f:
-        # Read BMP Header (14 bytes)
-        bmp_header = f.read(14)
-        if bmp_header[:2] != b'BM':
-            raise ValueError("Not a valid BMP file")
-            
-        pixel_data_offset = struct.unpack('<I', bmp_header[10:14])[0]
+# Fill colors of japan_map_base.bmp. Kansai and Shikoku share the orange;
+# split_shared_color tells them apart by location. Okinawa is outline only.
+REGION_COLORS = {
+    'Hokkaido': (14, 114, 199), # Blue
+    'Tohoku': (94, 176, 220), # Light blue
+    'Kanto': (77, 185, 100), # Green
+    'Chubu': (157, 120, 188), # Purple
+    'Kansai': (233, 134, 2), # Orange (also Shikoku)
+    'Chugoku': (240, 203, 37), # Yellow
+    'Kyushu': (229, 105, 131), # Pink
+}
+COLOR_TOLERANCE = 40 # Max RGB distance to a fill color; anything further is ambiguous
+SHIKOKU_MIN_Y = 490 # Orange components centered below this are Shikoku (Kansai's center is ~474)
+
+# Connected-component labeling of the sampled land mask
+AMBIGUOUS_COLORS = ('RedGroup', 'Unknown') # Border lines and anti-aliased edges, resolved by their neighbours
+MIN_COMPONENT_DOTS = 3 # Smaller specks touching another component take the region around them
+DOMINANT_COLOR_SHARE = 0.85 # A landmass this uniformly colored is one region (edge anti-aliasing aside)
+
+def read_bmp_header(f):
+    # Read BMP Header (14 bytes)
+    bmp_header = f.read(14)
+    if bmp_header[:2] != b'BM':
+        raise ValueError("Not a valid BMP file")
         
-        # Read DIB Header (40 bytes for BITMAPINFOHEADER)
-        dib_header = f.read(40)
-        width, height = struct.unpack('<ii', dib_header[4:12])
-        bpp = struct.unpack('<H', dib_header[14:16])[0]
+    pixel_data_offset = struct.unpack('<I', bmp_header[10:14])[0]
+    
+    # Read DIB Header (40 bytes for BITMAPINFOHEADER)
+    dib_header = f.read(40)
+    width, height = struct.unpack('<ii', dib_header[4:12])
+    bpp = struct.unpack('<H', dib_header[14:16])[0]
+    
+    if bpp not in [24, 32]:
+        raise ValueError(f"Unsupported BPP: {bpp}. Only 24 or 32 bit BMP supported.")
         
-        if bpp not in [24, 32]:
-            raise ValueError(f"Unsupported BPP: {bpp}. Only 24 or 32 bit BMP supported.")
-            
-        # Handle negative height (top-down BMP)
-        is_top_down = height < 0
-        height = abs(height)
+    # Handle negative height (top-down BMP)
+    is_top_down = height < 0
+    height = abs(height)
+    
+    # Calculate row size with padding (rows are padded to 4-byte boundaries)
+    row_size = math.ceil((width * bpp) / 32) * 4
+    
+    return pixel_data_offset, width, height, bpp, is_top_down, row_size
+
+def read_bmp(filepath):
+    with open(filepath, 'rb') as f:
+        pixel_data_offset, width, height, bpp, is_top_down, row_size = read_bmp_header(f)
             
         # Move to pixel data
         f.seek(pixel_data_offset)
         
-        # Calculate row size with padding (rows are padded to 4-byte boundaries)
-        row_size = math.ceil((width * bpp) / 32) * 4
-        
         pixels = []
         # Read pixels
         raw_data = f.read()
@@ -62,163 +97,323 @@ def read_bmp(filepath):
         return width, height, pixels
 
 def get_region_from_color(r, g, b):
-    # Determine region based on color characteristics
-    # Image Colors (Approximate based on observation):
-    # Blue: Hokkaido
-    # Light Blue/Cyan: Tohoku
-    # Green: Kanto
-    # Purple: Chubu
-    # Yellow: Kansai
-    # Orange: Chugoku
-    # Light Red/Pink: Shikoku
-    # Red: Kyushu/Okinawa (Okinawa distinct if possible, else split by location)
+    # Region of a sampled pixel by nearest fill color of the base image.
+    # Pixels off the palette (border lines, anti-aliased edges, outline-only
+    # islands) come back as 'RedGroup' (reddish) or 'Unknown' and are resolved
+    # by their neighbours in label_components.
     
     # White background
     if r > 240 and g > 240 and b > 240:
         return None
-        
-    # Classify
-    # Blue dominant (Hokkaido)
-    if b > r + 50 and b > g + 50:
-        return 'Hokkaido'
-        
-    # Cyan/Light Blue (Tohoku) - High G and B, Low R
-    if g > r + 30 and b > r + 30:
-        return 'Tohoku'
-        
-    # Green dominant (Kanto)
-    if g > r + 30 and g > b + 30:
-        return 'Kanto'
-        
-    # Purple (Chubu) - High R and B, Medium/Low G
-    if r > g + 20 and b > g + 20:
-        return 'Chubu'
-        
-    # Yellow (Kansai) - High R and G, Low B
-    if r > b + 50 and g > b + 50:
-        return 'Kansai'
-        
-    # Orange (Chugoku) - High R, Med G, Low B
-    if r > g + 30 and r > b + 50:
-        return 'Chugoku'
-        
-    # Pink/Red (Shikoku/Kyushu) 
-    # Kyushu is usually Red, Shikoku Pink?
-    # Let's use simple logic: High R, everything else lower.
+    
+    best, best_dist = None, COLOR_TOLERANCE ** 2 + 1
+    for region, (pr, pg, pb) in REGION_COLORS.items():
+        dist = (r - pr) ** 2 + (g - pg) ** 2 + (b - pb) ** 2
+        if dist < best_dist:
+            best, best_dist = region, dist
+    if best:
+        return best
+    
     if r > g and r > b:
-        # Could be Kyushu, Shikoku, or Chugoku if logic overlaps.
-        # Check coordinates in the caller for disambiguation if colors are similar.
         return 'RedGroup'
-        
     return 'Unknown'
 
-def generate_js(width, height, pixels):
-    # Scan all dots first
-    all_dots = []
+# Region Name mappings
+NAME_MAP = {
+    'Hokkaido': '北海道',
+    'Tohoku': '東北',
+    'Kanto': '関東',
+    'Chubu': '中部',
+    'Kansai': '関西',
+    'Chugoku': '中国',
+    'Shikoku': '四国',
+    'Kyushu': '九州',
+    'Okinawa': '沖縄',
+    'Unknown': '日本'
+}
+
+# 8-connectivity on the sampling grid; the first four are the already-scanned half
+NEIGHBOURS = [(-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1)]
+
+def fallback_region(x, y, anchors):
+    # Components with no region color at all (islands drawn as outline only),
+    # decided once at the centroid: the Okinawa cut-off, else the region of the
+    # nearest colored dot. anchors: (x, y, region) of the colored components.
+    if y > 600 and x < 300:
+        return 'Okinawa'
+    if not anchors:
+        return 'Unknown'
+    return min(anchors, key=lambda a: (a[0] - x) ** 2 + (a[1] - y) ** 2)[2]
+
+def split_shared_color(region_key, x, y):
+    # Regions sharing a fill color, told apart at the component's centroid
+    if region_key == 'Kansai' and y > SHIKOKU_MIN_Y:
+        return 'Shikoku'
+    return region_key
+
+class UnionFind:
+    def __init__(self, n):
+        self.parent = list(range(n))
+
+    def find(self, i):
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]] # Path halving
+            i = parent[i]
+        return i
+
+    def union(self, a, b):
+        # The smaller index stays root, so labels don't depend on union order
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            if ra < rb:
+                ra, rb = rb, ra
+            self.parent[ra] = rb
+
+def label_components(dots):
+    # Returns the region of every dot. Dots are stored with their raw color class.
+    # Landmasses (8-connected land) dominated by one color are labeled with it as
+    # a whole; multi-region landmasses like Honshu are split into same-color
+    # components, ambiguous dots join the component most of their resolved
+    # neighbours belong to, and each component is labeled once by majority color.
+    n = len(dots)
+    grid = {(int(dots.x[i]) // DOT_SPACING, int(dots.y[i]) // DOT_SPACING): i for i in range(n)}
+    colors = [dots.color_of(i) for i in range(n)]
+    ambiguous = [c in AMBIGUOUS_COLORS for c in colors]
+    uf = UnionFind(n)
+
+    def neighbours(i, offsets=NEIGHBOURS):
+        gx, gy = int(dots.x[i]) // DOT_SPACING, int(dots.y[i]) // DOT_SPACING
+        for dx, dy in offsets:
+            j = grid.get((gx + dx, gy + dy))
+            if j is not None:
+                yield j
+
+    # 1. Same region color, 8-connected
+    for i in range(n):
+        if not ambiguous[i]:
+            for j in neighbours(i, NEIGHBOURS[:4]):
+                if colors[j] == colors[i]:
+                    uf.union(i, j)
+
+    # 2. Grow components over ambiguous dots one ring at a time; each pass votes on
+    # the state before it, so the result doesn't depend on scan order
+    resolved = [not a for a in ambiguous]
+    pending = [i for i in range(n) if ambiguous[i]]
+    while pending:
+        joins = {}
+        for i in pending:
+            votes = Counter(uf.find(j) for j in neighbours(i) if resolved[j])
+            if votes:
+                joins[i] = min(votes, key=lambda root: (-votes[root], root))
+        if not joins:
+            break
+        for i, root in joins.items():
+            uf.union(i, root)
+            resolved[i] = True
+        pending = [i for i in pending if not resolved[i]]
+
+    # 3. Leftover ambiguous dots (no region color reachable) form their own components
+    for i in pending:
+        for j in neighbours(i, NEIGHBOURS[:4]):
+            if not resolved[j]:
+                uf.union(i, j)
+
+    # 4. One label per component: majority region color, else the location fallback
+    members = {}
+    for i in range(n):
+        members.setdefault(uf.find(i), []).append(i)
+    component_region = {}
+    outline_only = []
+    for root, idxs in members.items():
+        cx = sum(dots.x[i] for i in idxs) / len(idxs)
+        cy = sum(dots.y[i] for i in idxs) / len(idxs)
+        votes = Counter(colors[i] for i in idxs if not ambiguous[i])
+        if votes:
+            component_region[root] = split_shared_color(min(votes, key=lambda c: (-votes[c], c)), cx, cy)
+        else:
+            outline_only.append((root, cx, cy))
+    anchors = [(dots.x[i], dots.y[i], component_region[uf.find(i)]) for i in range(n) if not ambiguous[i]]
+    for root, cx, cy in outline_only:
+        component_region[root] = fallback_region(cx, cy, anchors)
+
+    # 5. Tiny specks inside another component take the majority region around them
+    regions = [component_region[uf.find(i)] for i in range(n)]
+    for root, idxs in members.items():
+        if len(idxs) >= MIN_COMPONENT_DOTS:
+            continue
+        around = Counter(
+            component_region[uf.find(j)] for i in idxs for j in neighbours(i) if uf.find(j) != root
+        )
+        if around:
+            region = min(around, key=lambda r: (-around[r], r))
+            for i in idxs:
+                regions[i] = region
+
+    # 6. Islands: a landmass with one dominant region color is that region throughout
+    land = UnionFind(n)
+    for i in range(n):
+        for j in neighbours(i, NEIGHBOURS[:4]):
+            land.union(i, j)
+    landmasses = {}
+    for i in range(n):
+        landmasses.setdefault(land.find(i), []).append(i)
+    for idxs in landmasses.values():
+        votes = Counter(colors[i] for i in idxs if not ambiguous[i])
+        if not votes:
+            continue
+        color, count = min(votes.items(), key=lambda kv: (-kv[1], kv[0]))
+        if count >= DOMINANT_COLOR_SHARE * sum(votes.values()):
+            cx = sum(dots.x[i] for i in idxs) / len(idxs)
+            cy = sum(dots.y[i] for i in idxs) / len(idxs)
+            region = split_shared_color(color, cx, cy)
+            for i in idxs:
+                regions[i] = region
+    return regions
+
+def group_regions(dots, regions):
+    # Reorders dots so each region is one contiguous index range (regions in
+    # first-appearance order, dots in scan order) and computes the region table
+    # the client zooms with: {region: {start, end, bbox: [minX, minY, maxX, maxY]}}
+    dots.set_labels('region', regions)
+    dots.set_labels('name', [NAME_MAP.get(region, '日本') for region in regions])
+    
+    grouped = DotStore(coord_digits=0)
+    table = {}
+    for region, sub in dots.group_by_region().items():
+        start = len(grouped)
+        grouped.extend(sub)
+        bbox = [round(min(sub.x)), round(min(sub.y)), round(max(sub.x)), round(max(sub.y))]
+        table[region] = {'start': start, 'end': len(grouped), 'bbox': bbox}
+    return grouped, table
+
+def scan_dots(width, height, pixels):
+    # Scan all dots first (integer pixel coordinates)
+    all_dots = DotStore(coord_digits=0)
     
     for y in range(0, height, DOT_SPACING):
         for x in range(0, width, DOT_SPACING):
             r, g, b = pixels[y][x]
-            
-            region_key = get_region_from_color(r, g, b)
-            
-            if region_key:
-                # Disambiguate 'RedGroup' (Kyushu, Shikoku, maybe Okinawa)
-                if region_key == 'RedGroup':
-                    # Kyushu is left (x < 380)
-                    # Shikoku is right (x > 380)
-                    if x < 380:
-                        if y > 600 and x < 300: region_key = 'Okinawa'
-                        else: region_key = 'Kyushu'
-                    else:
-                        region_key = 'Shikoku'
-                        
-                # Define Name mappings
-                name_map = {
-                    'Hokkaido': '北海道',
-                    'Tohoku': '東北',
-                    'Kanto': '関東',
-                    'Chubu': '中部',
-                    'Kansai': '関西',
-                    'Chugoku': '中国',
-                    'Shikoku': '四国',
-                    'Kyushu': '九州',
-                    'Okinawa': '沖縄',
-                    'Unknown': '日本'
-                }
-                
-                # Coordinate fallback for 'Unknown' or missed colors
-                if region_key == 'Unknown':
-                     if y < 300: region_key = 'Hokkaido'
-                     elif y > 500: region_key = 'Kyushu'
-                     else: region_key = 'Honshu'
-                     
-                name = name_map.get(region_key, '日本')
-                
-                all_dots.append({
-                    'x': x,
-                    'y': y,
-                    'region': region_key,
-                    'name': name
-                })
+            color = get_region_from_color(r, g, b)
+            if color:
+                all_dots.append(x, y, color=color)
     
-    final_dots = all_dots
+    return all_dots
 
+def scan_png(filepath):
+    # Streams the PNG: only sampled rows are converted to pixels and classified,
+    # nothing but the current and previous scanline is kept in memory.
+    width, height, _, _ = read_png_header(filepath)
+    all_dots = DotStore(coord_digits=0)
+    for y, row_pixels in iter_png_rows(filepath, range(0, height, DOT_SPACING)):
+        for x in range(0, width, DOT_SPACING):
+            r, g, b = row_pixels[x]
+            color = get_region_from_color(r, g, b)
+            if color:
+                all_dots.append(x, y, color=color)
+    return width, height, all_dots
 
-    js_content = f"""// Japan Map Dot Pattern Generator
-document.addEventListener('DOMContentLoaded', () => {{
+def scan_band(filepath, rows):
+    # Worker: classify the sampled rows of one band straight from a read-only
+    # memory map of the BMP, so every worker shares the page cache instead of
+    # unpickling a decoded copy of the image.
+    band_dots = DotStore(coord_digits=0)
+    with open(filepath, 'rb') as f:
+        pixel_data_offset, width, height, bpp, is_top_down, row_size = read_bmp_header(f)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as raw_data:
+            step = bpp // 8
+            for y in rows:
+                row = y if is_top_down else height - 1 - y
+                row_start = pixel_data_offset + row * row_size
+                for x in range(0, width, DOT_SPACING):
+                    pixel_offset = row_start + x * step
+                    # BGR format
+                    b, g, r = raw_data[pixel_offset], raw_data[pixel_offset + 1], raw_data[pixel_offset + 2]
+                    color = get_region_from_color(r, g, b)
+                    if color:
+                        band_dots.append(x, y, color=color)
+    return band_dots
+
+def scan_dots_parallel(filepath, jobs):
+    # Split the sampled rows into contiguous horizontal bands (a few per worker
+    # for load balancing) and concatenate the per-band results in row order,
+    # which reproduces the serial scan exactly.
+    with open(filepath, 'rb') as f:
+        _, width, height, _, _, _ = read_bmp_header(f)
+    sampled_rows = list(range(0, height, DOT_SPACING))
+    n_bands = min(len(sampled_rows), jobs * 4)
+    band_size = math.ceil(len(sampled_rows) / n_bands)
+    bands = [sampled_rows[i:i + band_size] for i in range(0, len(sampled_rows), band_size)]
+    
+    all_dots = DotStore(coord_digits=0)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        # map() yields results in submission order
+        for band_dots in pool.map(scan_band, [filepath] * len(bands), bands):
+            all_dots.extend(band_dots)
+    return width, height, all_dots
+
+def write_js(path, dots, region_table):
+    # Stream head, dots and tail straight into the (atomically replaced) output file
+    template = JS_TEMPLATE.replace(REGIONS_PLACEHOLDER, json.dumps(region_table, ensure_ascii=False))
+    head, tail = split_template(template, DOTS_PLACEHOLDER)
+    with atomic_open(path) as f:
+        f.write(head)
+        write_chunks(f, dots.iter_json(fields=('x', 'y', 'region', 'name')))
+        f.write(tail)
+
+
+JS_TEMPLATE = """// Japan Map Dot Pattern Generator
+document.addEventListener('DOMContentLoaded', () => {
     initMap();
-}});
+});
+
+// Dots are grouped by region: {region: {start, end, bbox: [minX, minY, maxX, maxY]}}
+const japanRegions = /*@@REGIONS@@*/;
+const mapCircles = [];
 
-function initMap() {{
+function initMap() {
     const mapSvg = document.getElementById('japan-map');
     if (!mapSvg) return;
     
-    const japanDots = {str(final_dots).replace("'", '"')};
+    const japanDots = /*@@DOTS@@*/;
     
     mapSvg.innerHTML = '';
     
-    japanDots.forEach(dot => {{
+    japanDots.forEach(dot => {
         const circle = document.createElementNS('http://www.w3.org/2000/svg', 'circle');
         circle.setAttribute('cx', dot.x);
         circle.setAttribute('cy', dot.y);
         circle.setAttribute('r', '1.5');
-        circle.setAttribute('class', `prefecture region-${{dot.region.toLowerCase()}}`);
+        circle.setAttribute('class', `prefecture region-${dot.region.toLowerCase()}`);
         circle.setAttribute('data-name', dot.name);
         circle.setAttribute('data-region', dot.region);
         
-        circle.addEventListener('click', (e) => {{
+        circle.addEventListener('click', (e) => {
             e.stopPropagation();
             zoomToRegion(dot.region);
-        }});
+        });
         
-        circle.addEventListener('mouseenter', (e) => {{
-            showTooltip(e, `${{dot.region}}`);
-        }});
+        circle.addEventListener('mouseenter', (e) => {
+            showTooltip(e, `${dot.region}`);
+        });
         circle.addEventListener('mouseleave', hideTooltip);
         
+        mapCircles.push(circle);
         mapSvg.appendChild(circle);
-    }});
+    });
     
-    document.querySelector('.map-container').addEventListener('click', () => {{
+    document.querySelector('.map-container').addEventListener('click', () => {
         resetZoom();
-    }});
-}}
+    });
+}
 
-function zoomToRegion(regionName) {{
+function zoomToRegion(regionName) {
     const mapSvg = document.getElementById('japan-map');
-    const dots = document.querySelectorAll(`.prefecture[data-region="${{regionName}}"]`);
-    if (dots.length === 0) return;
+    const region = japanRegions[regionName];
+    if (!region) return;
     
-    let minX = Infinity, minY = Infinity, maxX = -Infinity, maxY = -Infinity;
-    dots.forEach(dot => {{
-        const x = parseFloat(dot.getAttribute('cx'));
-        const y = parseFloat(dot.getAttribute('cy'));
-        if (x < minX) minX = x;
-        if (y < minY) minY = y;
-        if (x > maxX) maxX = x;
-        if (y > maxY) maxY = y;
-    }});
+    // Bounds and dot range were computed at build time
+    const [minX, minY, maxX, maxY] = region.bbox;
     
     // Custom logic for Okinawa to not zoom too much if it's sparse
     let padding = 50;
@@ -226,58 +421,81 @@ function zoomToRegion(regionName) {{
 
     const width = maxX - minX + (padding * 2);
     const height = maxY - minY + (padding * 2);
-    const viewBox = `${{minX - padding}} ${{minY - padding}} ${{width}} ${{height}}`;
+    const viewBox = `${minX - padding} ${minY - padding} ${width} ${height}`;
     
     mapSvg.style.transition = 'all 0.8s cubic-bezier(0.25, 1, 0.5, 1)';
     mapSvg.setAttribute('viewBox', viewBox);
     
     document.getElementById('reset-zoom').style.display = 'block';
     
-    document.querySelectorAll('.prefecture').forEach(p => p.classList.add('faded'));
-    dots.forEach(p => p.classList.remove('faded'));
-}}
+    mapCircles.forEach((circle, i) => circle.classList.toggle('faded', i < region.start || i >= region.end));
+}
 
-function resetZoom() {{
+function resetZoom() {
     const mapSvg = document.getElementById('japan-map');
     // Default ViewBox for 800x800 image
     mapSvg.setAttribute('viewBox', '0 0 800 800'); 
     
     document.getElementById('reset-zoom').style.display = 'none';
-    document.querySelectorAll('.prefecture').forEach(p => p.classList.remove('faded'));
-}}
+    mapCircles.forEach(circle => circle.classList.remove('faded'));
+}
 
 let tooltip = null;
-function showTooltip(event, text) {{
-    if (!tooltip) {{
+function showTooltip(event, text) {
+    if (!tooltip) {
         tooltip = document.createElement('div');
         tooltip.className = 'map-tooltip';
         document.body.appendChild(tooltip);
-    }}
+    }
     tooltip.textContent = text;
     tooltip.style.display = 'block';
     tooltip.style.left = event.pageX + 10 + 'px';
     tooltip.style.top = event.pageY + 10 + 'px';
-}}
-function hideTooltip() {{
+}
+function hideTooltip() {
     if (tooltip) tooltip.style.display = 'none';
-}}
+}
 """
-    return js_content
 
 
-try:
-    print(f"Reading {INPUT_BMP}...")
-    w, h, px = read_bmp(INPUT_BMP)
-    print(f"Image size: {w}x{h}")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the dot map script from the base image.")
+    parser.add_argument('--input', default=INPUT_IMAGE, help="24/32-bit BMP or PNG base image")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="scan horizontal BMP bands in this many worker processes (default: 1, serial)")
+    args = parser.parse_args(argv)
     
-    print("Generating JS content...")
-    js_code = generate_js(w, h, px)
-    
-    print(f"Writing to {OUTPUT_JS}...")
-    with open(OUTPUT_JS, 'w') as f:
-        f.write(js_code)
+    try:
+        if is_png(args.input):
+            # PNG rows depend on the row above, so decoding is sequential; --jobs applies to BMP only
+            print(f"Streaming {args.input}...")
+            w, h, dots = scan_png(args.input)
+            print(f"Image size: {w}x{h}")
+        elif args.jobs > 1:
+            print(f"Scanning {args.input} in bands with {args.jobs} jobs...")
+            w, h, dots = scan_dots_parallel(args.input, args.jobs)
+            print(f"Image size: {w}x{h}")
+        else:
+            print(f"Reading {args.input}...")
+            w, h, px = read_bmp(args.input)
+            print(f"Image size: {w}x{h}")
+            
+            print("Scanning dots...")
+            dots = scan_dots(w, h, px)
         
-    print("Done!")
-    
-except Exception as e:
-    print(f"Error: {e}")
+        print("Labeling connected components...")
+        dots, region_table = group_regions(dots, label_components(dots))
+        for region, info in region_table.items():
+            print(f"  {region}: {info['end'] - info['start']} dots, bbox {info['bbox']}")
+        
+        print(f"Writing to {OUTPUT_JS}...")
+        write_js(OUTPUT_JS, dots, region_table)
+        service_worker.write_service_worker()
+            
+        print("Done!")
+        
+    except Exception as e:
+        print(f"Error: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+
+from map_writer import atomic_open
+
+# Writes sw.js, the site's service worker. The core map files are precached
+# under a version derived from their content hashes, so every rebuild that
+# changes them produces a new sw.js, which the browser installs and whose
+# activate step evicts the caches of older versions.
+# Called at the end of the generators; can also be run on its own.
+
+# Configuration
+SW_FILE = 'sw.js' # Site root, so the worker's scope covers every page
+CACHE_PREFIX = 'yu-ki-'
+PRECACHE_FILES = [ # Repo paths; index.html pages are cached under their directory URL
+    'events/index.html',
+    'assets/css/style.css',
+    'assets/css/events.css',
+    'assets/js/main.js',
+    'assets/data/events-data.js',
+    'assets/js/japan-map.js', # Standard variant, carries the overview data
+]
+LOADER_FILE = 'assets/js/japan-map-loader.js' # Precached only once a precached page loads it
+RUNTIME_MAX_ENTRIES = 80 # Region/variant scripts, images and visited pages
+NETWORK_TIMEOUT_MS = 3000 # Pages fall back to the cached copy after this long
+
+SW_TEMPLATE = """// Service worker (generated by service_worker.py, do not edit)
+const VERSION = /*@@VERSION@@*/;
+const PRECACHE = /*@@PREFIX@@*/ + 'precache-' + VERSION;
+const RUNTIME = /*@@PREFIX@@*/ + 'runtime-' + VERSION;
+const PRECACHE_URLS = /*@@URLS@@*/.map(path => new URL(path, self.location).href);
+const RUNTIME_MAX_ENTRIES = /*@@MAX_ENTRIES@@*/;
+const NETWORK_TIMEOUT_MS = /*@@TIMEOUT@@*/;
+
+self.addEventListener('install', event => {
+    // 'reload' skips the HTTP cache so a new version never precaches stale files
+    event.waitUntil(
+        caches.open(PRECACHE)
+            .then(cache => cache.addAll(PRECACHE_URLS.map(url => new Request(url, { cache: 'reload' }))))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(keys
+                .filter(key => key.startsWith(/*@@PREFIX@@*/) && key !== PRECACHE && key !== RUNTIME)
+                .map(key => caches.delete(key))))
+            .then(() => self.clients.claim())
+    );
+});
+
+async function trimRuntime() {
+    const cache = await caches.open(RUNTIME);
+    const keys = await cache.keys();
+    // Keys come back in insertion order, so the oldest entries go first
+    await Promise.all(keys.slice(0, Math.max(0, keys.length - RUNTIME_MAX_ENTRIES)).map(key => cache.delete(key)));
+}
+
+async function putCache(cacheName, key, response) {
+    if (!response || !response.ok) return;
+    const cache = await caches.open(cacheName);
+    await cache.put(key, response);
+    if (cacheName === RUNTIME) await trimRuntime();
+}
+
+function fetchAndCache(event, cacheName, key) {
+    // Registered with waitUntil right away, so the cache write outlives a response served from cache
+    const network = fetch(event.request);
+    event.waitUntil(network.then(response => putCache(cacheName, key, response.clone())).catch(() => {}));
+    return network;
+}
+
+async function staleWhileRevalidate(event, cacheName, key) {
+    const network = fetchAndCache(event, cacheName, key);
+    const cached = await caches.match(key);
+    return cached || network;
+}
+
+async function cacheFirst(event, key) {
+    // The precache only changes with VERSION, so a hit never needs revalidating
+    const cached = await caches.match(key);
+    return cached || fetchAndCache(event, PRECACHE, key);
+}
+
+async function networkFirst(event) {
+    // Pages change with every event update; fall back to the cache on slow or no network
+    const network = fetchAndCache(event, RUNTIME, event.request);
+    const timeout = new Promise(resolve => setTimeout(resolve, NETWORK_TIMEOUT_MS));
+    const first = await Promise.race([network.catch(() => null), timeout]);
+    if (first) return first;
+    return (await caches.match(event.request, { ignoreSearch: true })) || network;
+}
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') return;
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) return;
+
+    if (request.mode === 'navigate') {
+        event.respondWith(networkFirst(event));
+    } else if (PRECACHE_URLS.includes(url.origin + url.pathname)) {
+        // Edits to these files change VERSION, so rerun this script after hand-editing one
+        event.respondWith(cacheFirst(event, url.origin + url.pathname));
+    } else {
+        event.respondWith(staleWhileRevalidate(event, RUNTIME, request));
+    }
+});
+"""
+
+def precache_url(path):
+    if os.path.basename(path) == 'index.html':
+        return os.path.dirname(path) + '/'
+    return path
+
+def asset_version(paths):
+    # Short hash over the precached files' names and contents
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(path.encode('utf-8') + b'\0')
+        with open(path, 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()[:12]
+
+def render_service_worker(version, urls):
+    replacements = {
+        '/*@@VERSION@@*/': json.dumps(version),
+        '/*@@PREFIX@@*/': json.dumps(CACHE_PREFIX),
+        '/*@@URLS@@*/': json.dumps(urls),
+        '/*@@MAX_ENTRIES@@*/': str(RUNTIME_MAX_ENTRIES),
+        '/*@@TIMEOUT@@*/': str(NETWORK_TIMEOUT_MS),
+    }
+    script = SW_TEMPLATE
+    for placeholder, value in replacements.items():
+        script = script.replace(placeholder, value)
+    return script
+
+def loads_loader(path):
+    # True if the page's script tags point at the variant loader (see use_variant_loader)
+    if not path.endswith('.html'):
+        return False
+    with open(path, encoding='utf-8') as f:
+        return os.path.basename(LOADER_FILE) in f.read()
+
+def precache_files():
+    files = [p for p in PRECACHE_FILES if os.path.exists(p)]
+    if os.path.exists(LOADER_FILE) and any(loads_loader(p) for p in files):
+        files.append(LOADER_FILE)
+    return files
+
+def write_service_worker(path=SW_FILE):
+    files = precache_files()
+    missing = sorted(set(PRECACHE_FILES) - set(files))
+    if missing:
+        print(f"Warning: not precaching missing files: {', '.join(missing)}")
+    version = asset_version(files)
+    print(f"Writing {path} (version {version})...")
+    with atomic_open(path) as f:
+        f.write(render_service_worker(version, [precache_url(p) for p in files]))
+    return version
+
+if __name__ == "__main__":
+    write_service_worker()
@@ -0,0 +1,84 @@
+// Service worker (generated by service_worker.py, do not edit)
+const VERSION = "e0b6a3a5a109";
+const PRECACHE = "yu-ki-" + 'precache-' + VERSION;
+const RUNTIME = "yu-ki-" + 'runtime-' + VERSION;
+const PRECACHE_URLS = ["events/", "assets/css/style.css", "assets/css/events.css", "assets/js/main.js", "assets/data/events-data.js", "assets/js/japan-map.js"].map(path => new URL(path, self.location).href);
+const RUNTIME_MAX_ENTRIES = 80;
+const NETWORK_TIMEOUT_MS = 3000;
+
+self.addEventListener('install', event => {
+    // 'reload' skips the HTTP cache so a new version never precaches stale files
+    event.waitUntil(
+        caches.open(PRECACHE)
+            .then(cache => cache.addAll(PRECACHE_URLS.map(url => new Request(url, { cache: 'reload' }))))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(keys
+                .filter(key => key.startsWith("yu-ki-") && key !== PRECACHE && key !== RUNTIME)
+                .map(key => caches.delete(key))))
+            .then(() => self.clients.claim())
+    );
+});
+
+async function trimRuntime() {
+    const cache = await caches.open(RUNTIME);
+    const keys = await cache.keys();
+    // Keys come back in insertion order, so the oldest entries go first
+    await Promise.all(keys.slice(0, Math.max(0, keys.length - RUNTIME_MAX_ENTRIES)).map(key => cache.delete(key)));
+}
+
+async function putCache(cacheName, key, response) {
+    if (!response || !response.ok) return;
+    const cache = await caches.open(cacheName);
+    await cache.put(key, response);
+    if (cacheName === RUNTIME) await trimRuntime();
+}
+
+function fetchAndCache(event, cacheName, key) {
+    // Registered with waitUntil right away, so the cache write outlives a response served from cache
+    const network = fetch(event.request);
+    event.waitUntil(network.then(response => putCache(cacheName, key, response.clone())).catch(() => {}));
+    return network;
+}
+
+async function staleWhileRevalidate(event, cacheName, key) {
+    const network = fetchAndCache(event, cacheName, key);
+    const cached = await caches.match(key);
+    return cached || network;
+}
+
+async function cacheFirst(event, key) {
+    // The precache only changes with VERSION, so a hit never needs revalidating
+    const cached = await caches.match(key);
+    return cached || fetchAndCache(event, PRECACHE, key);
+}
+
+async function networkFirst(event) {
+    // Pages change with every event update; fall back to the cache on slow or no network
+    const network = fetchAndCache(event, RUNTIME, event.request);
+    const timeout = new Promise(resolve => setTimeout(resolve, NETWORK_TIMEOUT_MS));
+    const first = await Promise.race([network.catch(() => null), timeout]);
+    if (first) return first;
+    return (await caches.match(event.request, { ignoreSearch: true })) || network;
+}
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') return;
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) return;
+
+    if (request.mode === 'navigate') {
+        event.respondWith(networkFirst(event));
+    } else if (PRECACHE_URLS.includes(url.origin + url.pathname)) {
+        // Edits to these files change VERSION, so rerun this script after hand-editing one
+        event.respondWith(cacheFirst(event, url.origin + url.pathname));
+    } else {
+        event.respondWith(staleWhileRevalidate(event, RUNTIME, request));
+    }
+});